@@ -1,6 +1,5 @@
 import uuid
-import json
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
@@ -13,7 +12,7 @@ from typing import List, Optional
 from core.dependencies import get_db, get_current_user
 from database.models.user import User
 from database.models.conversation import Conversation, Message
-from services.ai.chat_service import ChatService
+from services.ai.chat_service import ChatService, sse_event
 from core.dependencies import get_chat_service
 from schemas.chat import (
     ChatRequest, 
@@ -204,12 +203,19 @@ async def delete_conversation(
         )
     return None
 
-# Define media type for streaming JSON lines
-STREAMING_JSON_MEDIA_TYPE = "application/x-ndjson"
+# Chat stream is sent as server-sent events
+SSE_MEDIA_TYPE = "text/event-stream"
+# Ask reverse proxies (nginx X-Accel-Buffering) and caches not to buffer the event stream
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
 
-@router.post("/stream", response_class=StreamingResponse, responses={200: {"content": {STREAMING_JSON_MEDIA_TYPE: {}}}}) 
+@router.post("/stream", response_class=StreamingResponse, responses={200: {"content": {SSE_MEDIA_TYPE: {}}}}) 
 async def stream_chat_message(
     chat_request: ChatRequest,
+    request: Request,
     session: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
     chat_service: ChatService = Depends(get_chat_service)
@@ -219,11 +225,12 @@ async def stream_chat_message(
         stream_generator = chat_service.stream_chat_response_full(
             db=session, 
             user=current_user, 
-            chat_request=chat_request
+            chat_request=chat_request,
+            is_disconnected=request.is_disconnected
         )
         
         # Return the async generator from the service within StreamingResponse
-        return StreamingResponse(stream_generator, media_type=STREAMING_JSON_MEDIA_TYPE)
+        return StreamingResponse(stream_generator, media_type=SSE_MEDIA_TYPE, headers=SSE_HEADERS)
 
     except ValueError as e:
         # Handle known errors like conversation not found from service
@@ -231,14 +238,14 @@ async def stream_chat_message(
         # Cannot raise HTTPException directly here as headers are already sent.
         # Client needs to handle potential error messages within the stream.
         async def error_stream():
-             yield json.dumps({"error": str(e)}) + "\n"
-        return StreamingResponse(error_stream(), media_type=STREAMING_JSON_MEDIA_TYPE, status_code=404)
+             yield sse_event({"error": str(e)})
+        return StreamingResponse(error_stream(), media_type=SSE_MEDIA_TYPE, headers=SSE_HEADERS, status_code=404)
     except Exception as e:
         logger.error(f"Error during chat stream: {e}", exc_info=True)
         # General error - attempt to stream an error message
         async def error_stream():
-             yield json.dumps({"error": "An internal server error occurred during streaming."}) + "\n"
-        return StreamingResponse(error_stream(), media_type=STREAMING_JSON_MEDIA_TYPE, status_code=500)
+             yield sse_event({"error": "An internal server error occurred during streaming."})
+        return StreamingResponse(error_stream(), media_type=SSE_MEDIA_TYPE, headers=SSE_HEADERS, status_code=500)
 
 @router.post("/rag", response_model=RagResponse)
 async def query_documents(
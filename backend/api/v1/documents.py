@@ -31,6 +31,7 @@ from modules.document.service import DocumentService
 import logging
 import os # Ensure os is imported if not already at top level
 import aiofiles # Import aiofiles for async file reading
+import aiofiles.os
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -80,15 +81,8 @@ async def upload_document(
 
         logger.info(f"Document created with ID: {document.id}")
 
-        # Get the fresh document from the database to ensure all fields are present
-        fresh_document = await doc_service.get_document(db, document.id)
-        if not fresh_document:
-            error_msg = "Could not retrieve the newly created document"
-            logger.error(error_msg)
-            raise HTTPException(status_code=500, detail=error_msg)
-
-        # Create Pydantic response object
-        response_object = DocumentResponse.model_validate(fresh_document)
+        # create_document returns the row as written (INSERT ... RETURNING), no re-read needed
+        response_object = DocumentResponse.model_validate(document)
         logger.info(f"Document created successfully: {response_object.id}")
         
         return response_object
@@ -219,7 +213,7 @@ async def download_document(
         file_path = document.file_path
 
         # Check if file exists physically on disk
-        if not os.path.exists(file_path):
+        if not await aiofiles.os.path.exists(file_path):
             logger.error(f"File not found at path: {file_path} for document {document_id}")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -313,8 +307,8 @@ async def delete_document(
     Delete a document
     """
     try:
-        # Get document to verify ownership before deleting
-        document = await doc_service.get_document(db=db, document_id=document_id)
+        # Get the owner to verify permissions before deleting (no content or related rows)
+        document = await doc_service.get_document_owner_and_status(db, document_id)
         if not document:
             # If it does not exist, it is idempotent, we could return 204 or 404
             # Returning 404 is more informative if the client expected it to exist
@@ -324,7 +318,8 @@ async def delete_document(
              )
 
         # Verify that the document belongs to the user or is admin
-        if document.user_id != current_user.id and current_user.role != "admin":
+        owner_id, _ = document
+        if owner_id != current_user.id and current_user.role != "admin":
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You do not have permission to delete this document"
@@ -373,13 +368,14 @@ async def create_document_embeddings(
     Expects a JSON body with 'embeddings', 'chunks_text' and optionally 'model'.
     """
     try:
-        # Verify document ownership
-        document = await doc_service.get_document(db, document_id)
+        # Verify document ownership (owner and status only, not the whole row)
+        document = await doc_service.get_document_owner_and_status(db, document_id)
         if not document:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Document not found"
             )
+        owner_id, _ = document
 
         # Pydantic validation ensures embeddings/chunks exist and lengths match
         embeddings = payload.embeddings
@@ -387,14 +383,14 @@ async def create_document_embeddings(
         model = payload.model
 
         # Verify document ownership
-        if document.user_id != current_user.id and current_user.role != "admin":
+        if owner_id != current_user.id and current_user.role != "admin":
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You do not have permission to modify the embeddings of this document"
             )
 
         # Guardar embeddings
-        # The service returns a list of the created ORM objects
+        # The service returns the IDs of the created rows
         saved_embeddings_list = await doc_service.save_embeddings(
             db=db,
             document_id=document_id,
@@ -402,6 +398,9 @@ async def create_document_embeddings(
             chunks_text=chunks_text,
             model=model
         )
+        # save_embeddings leaves the commit to the caller: the DELETE of the previous embeddings
+        # and the INSERT of the new ones are committed together, once
+        await db.commit()
 
         # Get the count of saved embeddings from the list length
         saved_embeddings_count = len(saved_embeddings_list)
@@ -482,8 +481,8 @@ async def search_documents(
 async def process_document_embeddings(
     document_id: UUID,
     model: str = Query("text-embedding-3-small", description="Modelo de embedding a usar"),
-    chunk_size: int = Query(1000, ge=100, le=8000, description="Tamaño del chunk"),
-    chunk_overlap: int = Query(200, ge=0, le=1000, description="Superposición de chunks"),
+    chunk_size: int = Query(512, ge=100, le=2048, description="Tamaño del chunk (tokens)"),
+    chunk_overlap: int = Query(128, ge=0, le=512, description="Superposición de chunks (tokens)"),
     current_user = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
     doc_service: DocumentService = Depends(get_document_service)
@@ -493,27 +492,26 @@ async def process_document_embeddings(
     extracts text, divides it into chunks, generates embeddings and saves them.
     """
     try:
-        # 1. Get the complete document
-        document = await doc_service.get_document(db, document_id)
+        # 1. Get owner and status only (the content and related rows are not needed here)
+        document = await doc_service.get_document_owner_and_status(db, document_id)
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
+        owner_id, processing_status = document
 
         # 2. Verify permissions
-        if document.user_id != current_user.id and current_user.role != "admin":
+        if owner_id != current_user.id and current_user.role != "admin":
             raise HTTPException(status_code=403, detail="You do not have permission")
             
         # Prevent re-processing if already completed or in progress
         from database.models.document import ProcessingStatus # Import Enum
-        if document.processing_status in [ProcessingStatus.COMPLETED, ProcessingStatus.PROCESSING, ProcessingStatus.PENDING]:
+        if processing_status in [ProcessingStatus.COMPLETED, ProcessingStatus.PROCESSING, ProcessingStatus.PENDING]:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
-                detail=f"Document is already processing or completed (status: {document.processing_status.value})"
+                detail=f"Document is already processing or completed (status: {processing_status.value})"
             )
             
-        # Set status to PENDING before dispatching
-        document.processing_status = ProcessingStatus.PENDING
-        await db.commit() # Commit the status update
-        await db.refresh(document) # Refresh to reflect the change if needed later
+        # Set status to PENDING before dispatching (UPDATE by primary key, committed)
+        await doc_service.update_document_status(db, document_id, ProcessingStatus.PENDING)
         logger.info(f"Set document {document_id} status to PENDING")
 
         # 3. Dispatch the processing task to Celery
@@ -564,8 +562,8 @@ async def reprocess_document_embeddings(
     document_id: UUID,
     # Allow specifying model, chunk size, etc., similar to initial processing
     model: str = Query("text-embedding-3-small", description="Modelo de embedding a usar para reprocesar"),
-    chunk_size: int = Query(1000, ge=100, le=8000, description="Tamaño del chunk para reprocesar"),
-    chunk_overlap: int = Query(200, ge=0, le=1000, description="Superposición de chunks para reprocesar"),
+    chunk_size: int = Query(512, ge=100, le=2048, description="Tamaño del chunk para reprocesar (tokens)"),
+    chunk_overlap: int = Query(128, ge=0, le=512, description="Superposición de chunks para reprocesar (tokens)"),
     current_user = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
     doc_service: DocumentService = Depends(get_document_service) # Assuming doc_service is needed
@@ -575,34 +573,32 @@ async def reprocess_document_embeddings(
     Allows reprocessing for documents that are COMPLETED or FAILED.
     """
     try:
-        # 1. Get the document
-        document = await doc_service.get_document(db, document_id) # Use basic get_document
+        # 1. Get owner and status only (the content and related rows are not needed here)
+        document = await doc_service.get_document_owner_and_status(db, document_id)
         if not document:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+        owner_id, processing_status = document
 
         # 2. Verify permissions
-        if document.user_id != current_user.id and current_user.role != "admin":
+        if owner_id != current_user.id and current_user.role != "admin":
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission")
             
         # 3. Check status - Allow reprocessing for COMPLETED or FAILED
         from database.models.document import ProcessingStatus # Import Enum
-        if document.processing_status in [ProcessingStatus.PENDING, ProcessingStatus.PROCESSING]:
+        if processing_status in [ProcessingStatus.PENDING, ProcessingStatus.PROCESSING]:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
-                detail=f"Document is already being processed or pending (status: {document.processing_status.value}). Cannot reprocess yet."
+                detail=f"Document is already being processed or pending (status: {processing_status.value}). Cannot reprocess yet."
             )
-        elif document.processing_status not in [ProcessingStatus.COMPLETED, ProcessingStatus.FAILED, ProcessingStatus.NOT_PROCESSED]:
+        elif processing_status not in [ProcessingStatus.COMPLETED, ProcessingStatus.FAILED, ProcessingStatus.NOT_PROCESSED]:
             # If it's in some other unexpected state, maybe prevent reprocessing
              raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
-                detail=f"Document is in an unexpected state ({document.processing_status.value}). Cannot reprocess."
+                detail=f"Document is in an unexpected state ({processing_status.value}). Cannot reprocess."
             )
             
-        # 4. Update status to PENDING and clear error message before dispatching
-        document.processing_status = ProcessingStatus.PENDING
-        document.error_message = None # Clear previous error
-        await db.commit() # Commit the status update
-        await db.refresh(document) # Refresh to reflect the change
+        # 4. Update status to PENDING and clear error message before dispatching (UPDATE by primary key)
+        await doc_service.update_document_status(db, document_id, ProcessingStatus.PENDING, clear_error=True)
         logger.info(f"Set document {document_id} status to PENDING for reprocessing.")
 
         # 5. Dispatch the processing task to Celery
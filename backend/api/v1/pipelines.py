@@ -6,6 +6,7 @@ from sqlalchemy import select
 import uuid
 from uuid import UUID
 
+from core.config import settings
 from core.dependencies import get_current_user, get_db, get_current_admin_user
 from database.models.user import User
 from database.models.pipeline import Pipeline, PipelineExecution, ExecutionStatus
@@ -292,28 +293,35 @@ async def process_batch(
         if not pipeline_config:
              raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pipeline configuration not found")
 
-        # TODO: Add validation here or in service to check if user has access to all document_ids
-
         job_id = str(uuid.uuid4()) # Generate Job ID
-        execution_ids = []
 
         # Create execution records via service
         executions = await pipeline_service.create_batch_executions(
              db, request.pipeline_id, request.document_ids, current_user, request.parameters
         )
+        execution_ids = [str(execution.id) for execution in executions]
 
-        # Trigger background tasks for each execution
+        # Trigger the executions as one chord: each task runs a chunk of the batch in-process, the
+        # chunks run in parallel across workers and monitor_batch_process runs once all of them
+        # have finished
         try:
-            from tasks.tasks import execute_pipeline as celery_execute_pipeline
-            for execution in executions:
-                logger.info(f"Launching batch Celery task for execution ID {execution.id}")
-                task = celery_execute_pipeline.delay(
-                    str(execution.pipeline_id),
-                    str(execution.document_id),
-                    str(execution.id)
-                )
-                execution_ids.append(str(execution.id))
-                # Optionally save task IDs if needed
+            from celery import chord
+            from tasks.tasks import execute_pipeline_batch, monitor_batch_process
+            if executions:
+                # Every execution of the batch belongs to the same pipeline
+                pipeline_id_str = str(request.pipeline_id)
+                pairs = [
+                    (str(execution.document_id), execution_id)
+                    for execution, execution_id in zip(executions, execution_ids)
+                ]
+                chunk_size = max(1, settings.PIPELINE_BATCH_CHUNK_SIZE)
+                header = [
+                    execute_pipeline_batch.s(pipeline_id_str, pairs[i:i + chunk_size], job_id)
+                    for i in range(0, len(pairs), chunk_size)
+                ]
+                # The callback receives the header results (lists of status dicts carrying each execution_id)
+                chord(header)(monitor_batch_process.s(job_id))
+                logger.info(f"Launched batch {job_id} as a chord of {len(header)} Celery tasks")
         except ImportError:
             logger.error("Celery tasks not found. Cannot launch background execution for batch.")
             raise HTTPException(
@@ -331,6 +339,11 @@ async def process_batch(
         # Return job ID and initial status
         return BatchJobResponse(job_id=job_id, status="pending", total_documents=len(executions), execution_ids=execution_ids)
 
+    except HTTPException:
+        raise
+    except PermissionError as e:
+        logger.warning(f"Permission denied for batch process: {e}")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
     except ValueError as e: # Catch errors from service during execution creation
         logger.error(f"Error initiating batch process: {e}")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -63,8 +63,7 @@ async def update_current_user(
     try:
         # Check if email is already registered by another user
         if user_data.email and user_data.email != current_user.email:
-            existing_user = await auth_service.get_user_by_email(db, user_data.email)
-            if existing_user and str(existing_user.id) != str(current_user.id):
+            if await auth_service.email_exists(db, user_data.email, exclude_user_id=current_user.id):
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Email is already registered"
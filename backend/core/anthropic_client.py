@@ -36,7 +36,8 @@ class AnthropicClient(LLMClientInterface):
         model: str,
         temperature: float = 0.7,
         max_tokens: Optional[int] = 1024, # Anthropic requires max_tokens
-        stream: bool = False
+        stream: bool = False,
+        prompt_cache_key: Optional[str] = None # Not used by Anthropic
     ) -> Union[str, AsyncGenerator[str, None]]:
         if not self.client:
              raise RuntimeError("AnthropicClient is not initialized (Missing API Key?).")
@@ -57,12 +57,19 @@ class Settings(BaseSettings):
     
     # Redis configuration
     REDIS_URL: str = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+    # Redis cache calls are skipped for REDIS_BREAKER_RESET_SECONDS after this many consecutive failures
+    REDIS_BREAKER_FAILURE_THRESHOLD: int = int(os.environ.get("REDIS_BREAKER_FAILURE_THRESHOLD", 5))
+    REDIS_BREAKER_RESET_SECONDS: int = int(os.environ.get("REDIS_BREAKER_RESET_SECONDS", 30))
     
     # Celery configuration
     CELERY_BROKER_URL: str = os.environ.get("CELERY_BROKER_URL", "redis://localhost:6379/0")
     CELERY_RESULT_BACKEND: str = os.environ.get("CELERY_RESULT_BACKEND", "redis://localhost:6379/1")
-    CELERY_WORKER_CONCURRENCY: int = int(os.environ.get("CELERY_WORKER_CONCURRENCY", 4))
+    CELERY_WORKER_CONCURRENCY: int = int(os.environ.get("CELERY_WORKER_CONCURRENCY", 8))
     CELERY_WORKER_POOL: str = os.environ.get("CELERY_WORKER_POOL", "prefork")
+    # Documents of a batch process run per Celery task (concurrently, within the task)
+    PIPELINE_BATCH_CHUNK_SIZE: int = int(os.environ.get("PIPELINE_BATCH_CHUNK_SIZE", 8))
+    # Executions of a chunk running at once; each holds a DB connection for its whole run
+    PIPELINE_BATCH_CONCURRENCY: int = int(os.environ.get("PIPELINE_BATCH_CONCURRENCY", 2))
     
     # External services / AI Provider Configuration
     AI_PROVIDER: str = os.environ.get("AI_PROVIDER", "openai").lower()
@@ -72,6 +79,48 @@ class Settings(BaseSettings):
     # Default models (can be overridden)
     DEFAULT_CHAT_MODEL: str = os.environ.get("DEFAULT_CHAT_MODEL", "gpt-4")
     DEFAULT_EMBEDDING_MODEL: str = os.environ.get("DEFAULT_EMBEDDING_MODEL", "text-embedding-3-small")
+
+    # Number of most recent messages sent to the LLM as conversation history
+    CHAT_CONTEXT_MESSAGES: int = int(os.environ.get("CHAT_CONTEXT_MESSAGES", 40))
+
+    # Messages sent verbatim to the LLM; older ones are replaced by a running summary
+    CHAT_WINDOW_MESSAGES: int = int(os.environ.get("CHAT_WINDOW_MESSAGES", 12))
+    # The summary is refreshed once this many messages not covered by it are older than the window
+    CHAT_SUMMARY_MIN_NEW_MESSAGES: int = int(os.environ.get("CHAT_SUMMARY_MIN_NEW_MESSAGES", 6))
+
+    # In-process cache of recent conversation history (per worker), avoids re-reading it every turn;
+    # entries are checked against the conversation's message count in the database before use
+    CHAT_HISTORY_CACHE_SIZE: int = int(os.environ.get("CHAT_HISTORY_CACHE_SIZE", 1024))
+    CHAT_HISTORY_CACHE_TTL: int = int(os.environ.get("CHAT_HISTORY_CACHE_TTL", 600))
+
+    # Exact-match Redis cache for low-temperature chat completions
+    CHAT_RESPONSE_CACHE_TTL: int = int(os.environ.get("CHAT_RESPONSE_CACHE_TTL", 3600))
+
+    # Query embedding cache (in-process LRU in front of Redis, vectors stored as float16)
+    EMBEDDING_CACHE_SIZE: int = int(os.environ.get("EMBEDDING_CACHE_SIZE", 1024))
+    EMBEDDING_CACHE_TTL: int = int(os.environ.get("EMBEDDING_CACHE_TTL", 7 * 24 * 3600))
+
+    # Persistent chunk embedding cache (embedding_cache table), pruned daily by age
+    CHUNK_EMBEDDING_CACHE_MAX_AGE_DAYS: int = int(os.environ.get("CHUNK_EMBEDDING_CACHE_MAX_AGE_DAYS", 30))
+
+    # Concurrent query embeddings are coalesced into one API call per window
+    EMBEDDING_BATCH_SIZE: int = int(os.environ.get("EMBEDDING_BATCH_SIZE", 64))
+    EMBEDDING_BATCH_WINDOW_MS: int = int(os.environ.get("EMBEDDING_BATCH_WINDOW_MS", 20))
+
+    # HNSW candidate list size for RAG similarity searches (pgvector default: 40). Searches use
+    # relaxed iterative scans, so filtering by user no longer caps the result count at ef_search;
+    # this only trades ranking recall against latency. Searches within one document rank exactly.
+    RAG_HNSW_EF_SEARCH: int = int(os.environ.get("RAG_HNSW_EF_SEARCH", 40))
+
+    # RAG semantic response cache (in-process, per worker)
+    RAG_SEMANTIC_CACHE_SIZE: int = int(os.environ.get("RAG_SEMANTIC_CACHE_SIZE", 1024))
+    RAG_SEMANTIC_CACHE_THRESHOLD: float = float(os.environ.get("RAG_SEMANTIC_CACHE_THRESHOLD", 0.95))
+    RAG_SEMANTIC_CACHE_TTL: int = int(os.environ.get("RAG_SEMANTIC_CACHE_TTL", 3600))
+
+    # RAG retrieval cache: chunks reused for queries within cosine distance TAU (in-process + Redis)
+    RAG_RETRIEVAL_CACHE_SIZE: int = int(os.environ.get("RAG_RETRIEVAL_CACHE_SIZE", 1024))
+    RAG_RETRIEVAL_CACHE_TAU: float = float(os.environ.get("RAG_RETRIEVAL_CACHE_TAU", 0.05))
+    RAG_RETRIEVAL_CACHE_TTL: int = int(os.environ.get("RAG_RETRIEVAL_CACHE_TTL", 300))
     
     # Document storage
     # Calculate path relative to the project root for local development default
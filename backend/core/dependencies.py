@@ -24,7 +24,6 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 from uuid import UUID
 
 # Import User model and the get_db dependency
@@ -218,9 +217,7 @@ async def get_current_user(
         raise credentials_exception
         
     # Search user in the database
-    query = select(User).where(User.id == user_id)
-    result = await db.execute(query)
-    user = result.scalar_one_or_none()
+    user = await db.get(User, user_id)
     
     if user is None:
         logger.warning(f"User with ID {user_id} not found in database")
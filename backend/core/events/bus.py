@@ -1,22 +1,47 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
 class EventBus:
     """Bus of events central for communication between components"""
-    
+
     def __init__(self):
         self.handlers = {}
-        
+        # Handler tasks still running; keeps them referenced until they finish
+        self._pending = set()
+
     async def publish(self, event):
-        """Publish an event on the bus"""
+        """
+        Publish an event on the bus.
+
+        Handlers run as background tasks, so the publisher (typically a request that has just
+        committed its changes) does not wait for side effects such as e-mails. Handler errors
+        are logged, not raised to the publisher.
+        """
         event_type = event.event_type
-        if event_type in self.handlers:
-            for handler in self.handlers[event_type]:
-                await handler(event)
-                
+        for handler in self.handlers.get(event_type, ()):
+            task = asyncio.create_task(handler(event))
+            self._pending.add(task)
+            task.add_done_callback(self._on_handler_done)
+
+    def _on_handler_done(self, task: asyncio.Task) -> None:
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Event handler failed: {task.exception()}", exc_info=task.exception())
+
+    async def drain(self):
+        """Wait for the handlers that are still running (e.g. on application shutdown)"""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
     def subscribe(self, event_type, handler):
         """Subscribe a handler to an event type"""
         if event_type not in self.handlers:
             self.handlers[event_type] = []
         self.handlers[event_type].append(handler)
-        
+
     def register_handler(self, event_type):
         """Decorator to register an event handler"""
         def decorator(handler):
@@ -17,7 +17,8 @@ class LLMClientInterface(ABC):
         model: str, 
         temperature: float = 0.7, 
         max_tokens: Optional[int] = None, # Add max_tokens if needed commonly
-        stream: bool = False
+        stream: bool = False,
+        prompt_cache_key: Optional[str] = None
     ) -> Union[str, AsyncGenerator[str, None]]:
         """
         Generates a chat completion response from the LLM.
@@ -28,6 +29,8 @@ class LLMClientInterface(ABC):
             temperature: Sampling temperature.
             max_tokens: Optional maximum tokens to generate.
             stream: Whether to return a streaming generator or a single string response.
+            prompt_cache_key: Optional stable key for requests sharing a long prompt prefix, used by
+                providers with prompt caching to route them to the same cache. Ignored otherwise.
 
         Returns:
             Either the complete response content as a string (if stream=False),
@@ -2,6 +2,8 @@ import logging
 import logging.handlers
 import os
 import json
+import queue
+import atexit
 import time
 import traceback
 from pathlib import Path
@@ -64,6 +66,46 @@ class ContextAdapter(logging.LoggerAdapter):
             
         return msg, kwargs
 
+class InProcessQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler feeding a QueueListener in the same process.
+    Records are never pickled, so exc_info is kept for the target formatters (e.g. JsonFormatter);
+    only the message is rendered up front so args are not formatted on the listener thread.
+    """
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+# Listeners started by configure_logging, stopped at interpreter exit
+_queue_listeners = []
+
+def _route_handlers_through_queue(target_logger: logging.Logger) -> None:
+    """
+    Move the logger's handlers behind a queue so that logging calls only enqueue the record
+    and the blocking I/O (console, rotating files) happens on a QueueListener thread
+    instead of the event loop.
+    """
+    handlers = [h for h in target_logger.handlers if not isinstance(h, InProcessQueueHandler)]
+    if not handlers:
+        return
+
+    log_queue = queue.SimpleQueue()
+    for handler in handlers:
+        target_logger.removeHandler(handler)
+    target_logger.addHandler(InProcessQueueHandler(log_queue))
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _queue_listeners.append(listener)
+
+def _stop_queue_listeners() -> None:
+    """Flush and stop all queue listeners."""
+    while _queue_listeners:
+        _queue_listeners.pop().stop()
+
+atexit.register(_stop_queue_listeners)
+
 def get_logger(name: str, request_id: Optional[str] = None, user_id: Optional[str] = None) -> logging.Logger:
     """
     Get a logger with contextual information attached.
@@ -228,5 +270,9 @@ def configure_logging() -> logging.Logger:
         # Logs will propagate to the root logger which has a console handler via basicConfig
         pass
     
+    # Hand off log I/O to background threads
+    for configured_logger in (logging.getLogger(), app_logger, security_logger, access_logger):
+        _route_handlers_through_queue(configured_logger)
+
     logging.info(f"Logging configured for {settings.ENVIRONMENT} environment")
     return app_logger 
\ No newline at end of file
@@ -1,8 +1,10 @@
 # backend/core/openai_client.py
+import asyncio
 import logging
+from functools import lru_cache
 from typing import List, Dict, Any, Union, AsyncGenerator, Optional
 
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, BadRequestError
 import httpx
 
 from core.config import settings
@@ -10,6 +12,49 @@ from core.llm_interface import LLMClientInterface, LLMMessage # Import the inter
 
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=None)
+def get_shared_http_client() -> httpx.AsyncClient:
+    """
+    Creates and returns the process-wide httpx client used for OpenAI calls.
+    HTTP/2 multiplexes concurrent (streaming) completions over few connections and
+    keep-alive avoids a new TLS handshake per request.
+    """
+    logger.info("Initializing shared HTTP/2 client for OpenAI...")
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=100, max_connections=200, keepalive_expiry=30),
+        timeout=httpx.Timeout(connect=5.0, read=60.0, write=10.0, pool=5.0),
+    )
+
+async def close_shared_http_client() -> None:
+    """Closes the shared httpx client (if it was created) on application shutdown."""
+    if get_shared_http_client.cache_info().currsize:
+        await get_shared_http_client().aclose()
+        get_shared_http_client.cache_clear()
+        logger.info("Shared HTTP client for OpenAI closed.")
+
+# Per-request limits of the embeddings endpoint (2048 inputs, 300k tokens summed over all
+# inputs). Tokens are estimated at ~4 characters each, with some headroom.
+EMBEDDING_MAX_INPUTS_PER_REQUEST = 2048
+EMBEDDING_MAX_TOKENS_PER_REQUEST = 250_000
+
+def _embedding_batches(texts: List[str]) -> List[List[str]]:
+    """Split texts into consecutive batches that each fit in one embeddings request."""
+    batches: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for text in texts:
+        tokens = len(text) // 4 + 1
+        if current and (len(current) >= EMBEDDING_MAX_INPUTS_PER_REQUEST
+                        or current_tokens + tokens > EMBEDDING_MAX_TOKENS_PER_REQUEST):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
 class OpenAIClient(LLMClientInterface):
     """Concrete implementation of LLMClientInterface for OpenAI."""
     
@@ -21,10 +66,8 @@ class OpenAIClient(LLMClientInterface):
             raise ValueError("OPENAI_API_KEY must be configured for OpenAIClient")
         else:
             try:
-                # Consistent timeout handling
-                timeout = httpx.Timeout(60.0, connect=5.0)
-                http_client = httpx.AsyncClient(timeout=timeout)
-                self.client = AsyncOpenAI(api_key=api_key, http_client=http_client)
+                # All OpenAIClient instances share one pooled HTTP/2 client
+                self.client = AsyncOpenAI(api_key=api_key, http_client=get_shared_http_client())
                 logger.info("OpenAIClient initialized successfully.")
             except Exception as e:
                 logger.error(f"OpenAIClient: Failed to initialize AsyncOpenAI - {e}", exc_info=True)
@@ -37,7 +80,8 @@ class OpenAIClient(LLMClientInterface):
         model: str,
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
-        stream: bool = False
+        stream: bool = False,
+        prompt_cache_key: Optional[str] = None
     ) -> Union[str, AsyncGenerator[str, None]]:
         if not self.client:
              raise RuntimeError("OpenAIClient is not initialized.")
@@ -51,6 +95,9 @@ class OpenAIClient(LLMClientInterface):
         }
         # Filter out None values for optional parameters like max_tokens
         request_params = {k: v for k, v in request_params.items() if v is not None}
+        if prompt_cache_key:
+            # Sent as an extra body field so it works regardless of the SDK version's typed params
+            request_params["extra_body"] = {"prompt_cache_key": prompt_cache_key}
         
         try:
             logger.debug(f"Calling OpenAI Chat Completions API: model={model}, stream={stream}, messages={messages}")
@@ -59,10 +106,14 @@ class OpenAIClient(LLMClientInterface):
             if stream:
                 # Standard stream handling for chat completions
                 async def stream_generator():
-                    async for chunk in response_or_stream:
-                        content_delta = chunk.choices[0].delta.content
-                        if content_delta is not None:
-                            yield content_delta
+                    try:
+                        async for chunk in response_or_stream:
+                            content_delta = chunk.choices[0].delta.content
+                            if content_delta is not None:
+                                yield content_delta
+                    finally:
+                        # Closing the generator early (e.g. client gone) releases the HTTP stream
+                        await response_or_stream.close()
                 return stream_generator()
             else:
                 # Standard non-streaming response handling
@@ -86,14 +137,39 @@ class OpenAIClient(LLMClientInterface):
              raise RuntimeError("OpenAIClient is not initialized.")
              
         try:
-            logger.debug(f"Calling OpenAI embeddings: model={model}, num_texts={len(texts)}")
-            response = await self.client.embeddings.create(
-                input=texts,
-                model=model
-            )
-            embeddings = [item.embedding for item in response.data]
+            batches = _embedding_batches(texts)
+            logger.debug(f"Calling OpenAI embeddings: model={model}, num_texts={len(texts)}, requests={len(batches)}")
+            # All chunks go out in as few requests as the endpoint limits allow, sent concurrently
+            results = await asyncio.gather(*(self._embed_batch(batch, model) for batch in batches))
+            embeddings = [embedding for batch_embeddings in results for embedding in batch_embeddings]
             logger.debug(f"Received {len(embeddings)} embeddings from OpenAI.")
             return embeddings
         except Exception as e:
             logger.error(f"OpenAI API error during embedding generation: {e}", exc_info=True)
-            raise 
\ No newline at end of file
+            raise
+
+    async def _embed_batch(self, batch: List[str], model: str, offset: Optional[int] = None) -> List[List[float]]:
+        """
+        Embed one batch in a single request. Transient errors are already retried by the SDK;
+        if the request is rejected (e.g. one input is invalid), the batch is bisected and both
+        halves are retried concurrently, so the failure is pinned to the offending chunk in about
+        2 * log2(n) requests instead of one request per input. `offset` is the position of the
+        batch's first input in the rejected batch (None for the original request).
+        """
+        try:
+            response = await self.client.embeddings.create(input=batch, model=model)
+        except BadRequestError as e:
+            if len(batch) == 1:
+                if offset is None:
+                    raise
+                raise ValueError(f"Embedding input {offset} of batch rejected: {e}") from e
+            if offset is None:
+                logger.warning(f"Embedding batch of {len(batch)} inputs rejected ({e}); bisecting to find the offending input.")
+            start = offset or 0
+            middle = len(batch) // 2
+            first_half, second_half = await asyncio.gather(
+                self._embed_batch(batch[:middle], model, start),
+                self._embed_batch(batch[middle:], model, start + middle),
+            )
+            return first_half + second_half
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
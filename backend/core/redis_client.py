@@ -0,0 +1,126 @@
+"""
+Shared async Redis client for application-level caching.
+"""
+import asyncio
+import logging
+import time
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+import redis.asyncio as redis
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=None)
+def get_redis_client() -> redis.Redis:
+    """Creates and returns a singleton async Redis client (the connection pool is created lazily)."""
+    logger.info("Initializing shared Redis client...")
+    # Short timeouts: callers use Redis as a cache, so a slow Redis must not stall requests
+    return redis.from_url(
+        settings.REDIS_URL,
+        socket_timeout=1.0,
+        socket_connect_timeout=1.0,
+    )
+
+
+class CircuitBreaker:
+    """
+    Process-local circuit breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls are skipped for
+    `reset_timeout` seconds; then a single probe call is let through (half-open). A successful
+    probe closes the circuit, a failed one opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """Whether a call may be attempted now."""
+        if self._opened_at is None:
+            return True
+        if self._probe_in_flight or time.monotonic() - self._opened_at < self.reset_timeout:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logger.info("Redis circuit closed: Redis is reachable again.")
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Let another probe through if the current one ended without an outcome (e.g. cancelled)."""
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probe_in_flight = False
+        if self._opened_at is not None or self._failures >= self.failure_threshold:
+            if self._opened_at is None:
+                logger.warning(
+                    f"Redis circuit opened after {self._failures} consecutive failures; "
+                    f"skipping cache calls for {self.reset_timeout:.0f}s."
+                )
+            self._opened_at = time.monotonic()
+
+
+@lru_cache(maxsize=None)
+def get_redis_breaker() -> CircuitBreaker:
+    """Singleton circuit breaker shared by all Redis cache calls of this process."""
+    return CircuitBreaker(
+        failure_threshold=settings.REDIS_BREAKER_FAILURE_THRESHOLD,
+        reset_timeout=settings.REDIS_BREAKER_RESET_SECONDS,
+    )
+
+
+async def _call_through_breaker(call: Callable[[], Awaitable[Any]]) -> Any:
+    breaker = get_redis_breaker()
+    if not breaker.allow():
+        return None
+    try:
+        result = await call()
+    except asyncio.CancelledError:
+        # The caller went away; this says nothing about Redis, but a half-open probe must be released
+        breaker.release_probe()
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return result
+
+
+async def redis_cache_call(command: str, *args: Any) -> Any:
+    """
+    Run a Redis command (e.g. "get", "setex") through the circuit breaker.
+
+    Returns None without touching Redis while the circuit is open, which callers treat as a cache
+    miss / skipped write. Errors are recorded and re-raised for the caller to log.
+    """
+    return await _call_through_breaker(lambda: getattr(get_redis_client(), command)(*args))
+
+
+async def redis_cache_pipeline(commands: List[Tuple[str, tuple]]) -> Optional[list]:
+    """
+    Run several Redis commands, given as (command, args) pairs, in one round trip (a pipeline
+    without MULTI/EXEC) through the circuit breaker.
+
+    Returns the list of replies, or None while the circuit is open. Errors are recorded and
+    re-raised for the caller to log.
+    """
+    async def run():
+        pipe = get_redis_client().pipeline(transaction=False)
+        for command, args in commands:
+            getattr(pipe, command)(*args)
+        return await pipe.execute()
+
+    return await _call_through_breaker(run)
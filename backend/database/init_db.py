@@ -5,7 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from database.session import async_engine as engine, AsyncSessionLocal as SessionLocal
 # Import all models to ensure SQLAlchemy registers them
-from database.models import BaseModel, User, Document, DocumentEmbedding, DocumentProcessingResult, Conversation, Message, Pipeline
+from database.models import BaseModel, User, Document, DocumentEmbedding, DocumentProcessingResult, EmbeddingCacheEntry, Conversation, Message, Pipeline
 from modules.auth.service import AuthService
 # Import settings
 from core.config import settings
@@ -13,12 +13,43 @@ from core.config import settings
 # Logging configuration
 logger = logging.getLogger(__name__)
 
+# Columns added to existing tables. create_all only creates missing tables, so databases created
+# before these columns existed get them here; every statement is idempotent.
+COLUMN_UPGRADES = (
+    "ALTER TABLE conversations ADD COLUMN IF NOT EXISTS summary TEXT",
+    "ALTER TABLE conversations ADD COLUMN IF NOT EXISTS summary_message_count INTEGER NOT NULL DEFAULT 0",
+)
+
+# Indexes declared in the models' __table_args__ after their table was first created. create_all
+# only builds the indexes of the tables it creates, so existing databases get them here. They must
+# match the model declarations; the first startup after an upgrade builds them (which can take a
+# while on large tables).
+INDEX_UPGRADES = (
+    # DocumentEmbedding: ANN index of the similarity search. It replaced a full-precision index the
+    # search can no longer use, which is dropped so writes stop maintaining it
+    "DROP INDEX IF EXISTS ix_document_embeddings_embedding_hnsw",
+    "CREATE INDEX IF NOT EXISTS ix_document_embeddings_embedding_halfvec_hnsw ON document_embeddings "
+    "USING hnsw ((embedding::halfvec(1536)) halfvec_cosine_ops) WITH (m = 16, ef_construction = 64)",
+    # Message: history reads and message counts by conversation, in timestamp order
+    "CREATE INDEX IF NOT EXISTS ix_messages_conversation_id_timestamp ON messages (conversation_id, timestamp)",
+    # DocumentEmbedding: a document's embeddings for one model (save_embeddings, cascades)
+    "CREATE INDEX IF NOT EXISTS ix_document_embeddings_document_id_model ON document_embeddings (document_id, model)",
+    # PipelineExecution: range joins of the monthly statistics
+    "CREATE INDEX IF NOT EXISTS ix_pipeline_executions_created_at ON pipeline_executions (created_at)",
+)
+
 async def create_tables(connection) -> None:
     """Create all database tables if they don't exist"""
     logger.info("Creating database tables...")
     await connection.run_sync(BaseModel.metadata.create_all)
     logger.info("Database tables created successfully")
 
+async def upgrade_tables(connection) -> None:
+    """Add the columns and indexes that create_all does not add to tables that already exist"""
+    for statement in COLUMN_UPGRADES + INDEX_UPGRADES:
+        await connection.execute(text(statement))
+    logger.info("Database columns and indexes are up to date")
+
 async def create_admin_user(db: AsyncSession) -> User:
     """Create an admin user if it doesn't exist"""
     # Check if admin user already exists
@@ -111,6 +142,7 @@ async def init_db():
     # Then create all tables
     async with engine.begin() as conn:
         await create_tables(conn)
+        await upgrade_tables(conn)
     
     # Create a session
     async with SessionLocal() as db:
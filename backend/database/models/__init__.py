@@ -1,5 +1,5 @@
 from database.models.base import BaseModel
-from database.models.document import Document, DocumentEmbedding, DocumentProcessingResult
+from database.models.document import Document, DocumentEmbedding, DocumentProcessingResult, EmbeddingCacheEntry
 from database.models.conversation import Conversation, Message
 from database.models.user import User
 from database.models.pipeline import Pipeline, PipelineExecution
@@ -10,6 +10,7 @@ __all__ = [
     "Document", 
     "DocumentEmbedding", 
     "DocumentProcessingResult", 
+    "EmbeddingCacheEntry",
     "Conversation", 
     "Message", 
     "User",
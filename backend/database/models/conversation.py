@@ -1,5 +1,5 @@
 from __future__ import annotations
-from sqlalchemy import Column, String, ForeignKey, Text, DateTime
+from sqlalchemy import Column, String, ForeignKey, Text, DateTime, Integer, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime
@@ -18,15 +18,25 @@ class Conversation(BaseModel):
     title: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     user_id: Mapped[uuid.UUID] = mapped_column(UUID, ForeignKey("users.id"), nullable=False)
+    # Running summary of the messages that fell out of the LLM history window
+    summary: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    summary_message_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
     
     # Relationships
     user: Mapped[User] = relationship(back_populates="conversations")
-    messages: Mapped[List[Message]] = relationship(back_populates="conversation", cascade="all, delete-orphan")
+    messages: Mapped[List[Message]] = relationship(
+        back_populates="conversation", cascade="all, delete-orphan", order_by="Message.timestamp"
+    )
 
 
 class Message(BaseModel):
     """Model for messages in a conversation"""
     __tablename__ = "messages"
+    __table_args__ = (
+        # History reads, the summary slice and message counts all filter by conversation and
+        # order by timestamp; this serves them without a sort
+        Index("ix_messages_conversation_id_timestamp", "conversation_id", "timestamp"),
+    )
     
     content: Mapped[str] = mapped_column(Text, nullable=False)
     role: Mapped[str] = mapped_column(String, nullable=False)  # 'user', 'assistant', 'system'
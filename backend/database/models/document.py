@@ -1,5 +1,5 @@
 from __future__ import annotations
-from sqlalchemy import Column, String, ForeignKey, Text, DateTime, ARRAY, JSON, Integer, Enum as SQLEnum
+from sqlalchemy import Column, String, ForeignKey, Text, DateTime, ARRAY, JSON, Integer, Index, UniqueConstraint, Enum as SQLEnum
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import UUID
 from database.models.base import BaseModel
@@ -7,7 +7,7 @@ import uuid
 from datetime import datetime
 from pgvector.sqlalchemy import Vector
 from typing import Optional, List, TYPE_CHECKING, Dict, Any
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 import enum
 
 # Import related types only for type checking to avoid circular imports
@@ -54,6 +54,20 @@ class Document(BaseModel):
 class DocumentEmbedding(BaseModel):
     """Model for document embeddings"""
     __tablename__ = "document_embeddings"
+    __table_args__ = (
+        # ANN index for the cosine-distance ORDER BY ... LIMIT of the similarity search. It indexes
+        # the vectors cast to halfvec (float16): half the index size and memory bandwidth per
+        # search, with negligible recall loss; the column itself keeps full precision.
+        Index(
+            "ix_document_embeddings_embedding_halfvec_hnsw",
+            text("(embedding::halfvec(1536)) halfvec_cosine_ops"),
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+        ),
+        # Lookup/delete of a document's embeddings for one model (save_embeddings) and the
+        # cascade from documents; without it both scan the whole embeddings table
+        Index("ix_document_embeddings_document_id_model", "document_id", "model"),
+    )
     
     document_id: Mapped[uuid.UUID] = mapped_column(UUID, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False)
     model: Mapped[str] = mapped_column(String, nullable=False)
@@ -69,6 +83,19 @@ class DocumentEmbedding(BaseModel):
     def __repr__(self):
         return f'<Document {self.document.title} ({self.id})>'
 
+class EmbeddingCacheEntry(BaseModel):
+    """Embedding of a chunk text keyed by (SHA-256 of the text, model), reused across documents"""
+    __tablename__ = "embedding_cache"
+    __table_args__ = (
+        UniqueConstraint("content_hash", "model", name="uq_embedding_cache_content_hash_model"),
+        # Entries are pruned by age (see prune_embedding_cache)
+        Index("ix_embedding_cache_created_at", "created_at"),
+    )
+
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    model: Mapped[str] = mapped_column(String, nullable=False)
+    embedding: Mapped[list[float]] = mapped_column(Vector(1536), nullable=False)
+
 class DocumentProcessingResult(BaseModel):
     """Model for document processing results"""
     __tablename__ = "document_processing_results"
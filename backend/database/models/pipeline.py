@@ -1,5 +1,5 @@
 from __future__ import annotations
-from sqlalchemy import Column, String, Text, JSON, UUID, ForeignKey, Enum, DateTime
+from sqlalchemy import Column, String, Text, JSON, UUID, ForeignKey, Enum, DateTime, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from database.models.base import BaseModel
 import enum
@@ -55,4 +55,9 @@ class PipelineExecution(BaseModel):
     pipeline: Mapped["Pipeline"] = relationship(back_populates="executions")
     document: Mapped["Document"] = relationship(back_populates="pipeline_executions")
     user_id: Mapped[uuid.UUID] = mapped_column(UUID, ForeignKey("users.id"), nullable=False)
-    user: Mapped["User"] = relationship(back_populates="pipeline_executions") 
\ No newline at end of file
+    user: Mapped["User"] = relationship(back_populates="pipeline_executions")
+
+    __table_args__ = (
+        # Range scans of the stats (executions per week/month) and the latest-executions listing
+        Index("ix_pipeline_executions_created_at", "created_at"),
+    ) 
\ No newline at end of file
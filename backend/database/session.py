@@ -11,10 +11,12 @@ from sqlalchemy.ext.asyncio import (
     async_scoped_session,
 )
 from sqlalchemy.pool import NullPool
-from sqlalchemy import event
+from sqlalchemy import event, cast, literal, JSON, Text
 import asyncio
 import logging
 
+import orjson
+
 from core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -27,6 +29,22 @@ pool_options = {
     "pool_recycle": 300,
 }
 
+def _json_serializer(value) -> str:
+    """
+    JSON encoder for JSON columns (pipeline results, metadata). orjson is several times faster
+    than the stdlib json on large nested results and natively handles UUIDs, datetimes and numpy
+    arrays; OPT_NON_STR_KEYS keeps accepting the non-string keys json.dumps allowed.
+    """
+    return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+
+def encoded_json(value):
+    """
+    SQL value for a JSON column, encoded now (once) instead of when the statement is bound.
+    Lets the same large value be written to several columns without re-encoding it for each;
+    raises TypeError if the value is not serializable.
+    """
+    return cast(literal(_json_serializer(value), Text), JSON)
+
 # Obtener la URL correcta desde settings
 connection_url = settings.get_async_database_url()
 logger.info(f"Using database connection URL (sanitized): {connection_url.replace(str(settings.POSTGRES_PASSWORD), '***')}")
@@ -36,6 +54,8 @@ async_engine = create_async_engine(
     connection_url,
     echo=settings.DB_ECHO_LOG,
     future=True,
+    json_serializer=_json_serializer,
+    json_deserializer=orjson.loads,
     **pool_options
 )
 
@@ -12,6 +12,8 @@ from core.middleware.logging_middleware import RequestLoggingMiddleware
 from core.middleware.security_middleware import SecurityMiddleware
 from core.exceptions import setup_exception_handlers
 from core.health import comprehensive_health_check, check_database_connection
+from core.openai_client import close_shared_http_client
+from core.events.bus import event_bus
 
 # Import handlers to register them (e.g., event handlers or similar)
 # TODO: Consider making registration more explicit if possible.
@@ -74,6 +76,21 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Error initializing database: {e}", exc_info=True)
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Event that runs when the application stops."""
+    logger.info("Shutting down application...")
+    # Let event handlers that are still running (e.g. welcome e-mails) finish
+    try:
+        await event_bus.drain()
+    except Exception as e:
+        logger.error(f"Error draining event handlers: {e}", exc_info=True)
+    # Drain the pooled keep-alive connections to the LLM provider
+    try:
+        await close_shared_http_client()
+    except Exception as e:
+        logger.error(f"Error closing shared HTTP client: {e}", exc_info=True)
+
 # Include API routes
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -1,7 +1,7 @@
 from typing import Optional, List
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, func
+from sqlalchemy import select, update, delete, func, exists
 from uuid import UUID
 
 from core.config import settings
@@ -51,6 +51,13 @@ class AuthService:
         logger.debug(f"User found for email {email}: {user is not None}")
         return user
     
+    async def email_exists(self, db: AsyncSession, email: str, exclude_user_id: Optional[UUID] = None) -> bool:
+        """Check whether an email is registered (optionally ignoring one user) without loading the row"""
+        condition = User.email == email
+        if exclude_user_id is not None:
+            condition = condition & (User.id != exclude_user_id)
+        return bool(await db.scalar(select(exists().where(condition))))
+    
     async def authenticate_user(self, db: AsyncSession, email: str, password: str) -> Optional[User]:
         """Authenticate user"""
         logger.info(f"Attempting authentication for user: {email}")
@@ -76,8 +83,7 @@ class AuthService:
     
     async def register_user(self, db: AsyncSession, user_data):
         """Register a new user"""
-        existing_user = await self.get_user_by_email(db, user_data.email)
-        if existing_user:
+        if await self.email_exists(db, user_data.email):
             logger.warning(f"Registration failed: Email {user_data.email} already exists.")
             raise EmailAlreadyExistsError("Email already registered")
             
@@ -215,10 +221,8 @@ class AuthService:
         
     async def update_user(self, db: AsyncSession, user_id: UUID, user_data):
         """Update user"""
-        # Get original user from database
-        query = select(User).where(User.id == user_id)
-        result = await db.execute(query)
-        db_user = result.scalars().first()
+        # Get original user from database (primary-key lookup, served from the identity map if loaded)
+        db_user = await db.get(User, user_id)
         
         if not db_user:
             return None
@@ -231,8 +235,7 @@ class AuthService:
         if user_data.email is not None:
             # Verify that the email does not exist for another user
             if user_data.email != db_user.email:
-                existing_user = await self.get_user_by_email(db, user_data.email)
-                if existing_user and str(existing_user.id) != str(user_id):
+                if await self.email_exists(db, user_data.email, exclude_user_id=user_id):
                     raise ValueError("Email already registered for another user")
             update_data["email"] = user_data.email
             
@@ -266,10 +269,8 @@ class AuthService:
         
     async def delete_user(self, db: AsyncSession, user_id: UUID) -> Optional[User]:
         """Delete user"""
-        # Get original user from database
-        query = select(User).where(User.id == user_id)
-        result = await db.execute(query)
-        db_user = result.scalars().first()
+        # Get original user from database (primary-key lookup, served from the identity map if loaded)
+        db_user = await db.get(User, user_id)
         
         if not db_user:
             return None # Return None if not found
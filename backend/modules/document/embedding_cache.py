@@ -0,0 +1,64 @@
+"""
+Persistent cache of chunk embeddings keyed by (sha256(chunk text), model).
+
+Identical chunks (boilerplate headers, legal clauses, templates) are embedded once and reused
+by every document that contains them. Entries older than CHUNK_EMBEDDING_CACHE_MAX_AGE_DAYS are
+deleted by the prune_embedding_cache task.
+"""
+import hashlib
+import logging
+from datetime import timedelta
+from typing import Dict, Iterable, List
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models.document import EmbeddingCacheEntry
+
+logger = logging.getLogger(__name__)
+
+def content_hash(text: str) -> str:
+    """Cache key of a chunk text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+async def get_cached_embeddings(db: AsyncSession, model: str, hashes: Iterable[str]) -> Dict[str, List[float]]:
+    """Fetch the cached embeddings of the given hashes for a model in one query"""
+    hashes = list(hashes)
+    if not hashes:
+        return {}
+    result = await db.execute(
+        select(EmbeddingCacheEntry.content_hash, EmbeddingCacheEntry.embedding)
+        .where(EmbeddingCacheEntry.model == model, EmbeddingCacheEntry.content_hash.in_(hashes))
+    )
+    # pgvector returns numpy arrays; callers work with plain lists like the LLM client returns
+    return {row.content_hash: row.embedding.tolist() for row in result}
+
+async def store_embeddings(db: AsyncSession, model: str, embeddings: Dict[str, List[float]]) -> None:
+    """
+    Store fresh embeddings (hash -> vector). Rows cached concurrently by another task are skipped.
+    Runs in a savepoint so a failed cache write does not abort the caller's transaction.
+    """
+    if not embeddings:
+        return
+    rows = [
+        {"content_hash": chunk_hash, "model": model, "embedding": embedding}
+        for chunk_hash, embedding in embeddings.items()
+    ]
+    try:
+        async with db.begin_nested():
+            await db.execute(
+                insert(EmbeddingCacheEntry).on_conflict_do_nothing(index_elements=["content_hash", "model"]),
+                rows,
+            )
+    except Exception as e:
+        logger.warning(f"Could not store {len(rows)} embeddings in the cache: {e}")
+
+async def prune_embeddings(db: AsyncSession, max_age_days: int) -> int:
+    """Delete the entries created more than `max_age_days` ago; returns how many were deleted"""
+    result = await db.execute(
+        delete(EmbeddingCacheEntry)
+        .where(EmbeddingCacheEntry.created_at < func.now() - timedelta(days=max_age_days))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
@@ -2,7 +2,7 @@ import os
 import uuid
 from pathlib import Path
 from dotenv import load_dotenv
-from sqlalchemy import select, func, delete, or_
+from sqlalchemy import select, func, delete, or_, update, exists, cast, JSON
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict, Any, Tuple
 from uuid import UUID
@@ -15,11 +15,14 @@ import json # Import json for serialization check
 from datetime import datetime # Import datetime
 from sqlalchemy.sql import text
 from sqlalchemy.sql.expression import bindparam
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.future import select
 import asyncio
 import aiofiles
+import aiofiles.os
 from sqlalchemy.dialects.postgresql import insert # Use for upsert
+from sqlalchemy.dialects.postgresql import JSONB
 
 # Import the LLM interface
 from core.llm_interface import LLMClientInterface
@@ -27,6 +30,7 @@ from database.models.document import Document, DocumentEmbedding, DocumentProces
 from database.models.pipeline import PipelineExecution, Pipeline
 from schemas.document import DocumentCreate, DocumentUpdate, DocumentResponse, DocumentProcessingResultResponse, PipelineExecutionResponse
 from core.config import settings
+from modules.document.versions import bump_documents_version
 # Configure logger
 logger = logging.getLogger(__name__)
 
@@ -111,25 +115,33 @@ class DocumentService:
             # Try to decode only for text files
             try:
                 # Limit the content size to avoid database problems
-                preview_size = min(10000, len(content))  # Only save up to 10KB as preview
+                preview_size = min(10000, file_size)  # Only save up to 10KB as preview
                 decoded_content = content[:preview_size].decode('utf-8', errors='ignore')
-                if len(content) > preview_size:
+                if file_size > preview_size:
                     decoded_content += "\n... [content truncated]"
             except Exception as e:
                 # If it fails, save a description of the file
                 decoded_content = f"[Binary content - {file_size} bytes - Saved in {file_name}]"
             
-        document = Document(
-            title=document_data.name,
-            content=decoded_content,
-            file_path=str(file_path),
-            type=file_ext.lstrip('.').upper(),  # Save extension without point and in uppercase
-            user_id=user_id
+        # RETURNING brings back the server defaults (timestamps, processing status) with the
+        # INSERT itself, so no refresh or re-read is needed afterwards
+        result = await db.execute(
+            insert(Document)
+            .values(
+                title=document_data.name,
+                content=decoded_content,
+                file_path=str(file_path),
+                type=file_ext.lstrip('.').upper(),  # Save extension without point and in uppercase
+                user_id=user_id
+            )
+            .returning(Document)
         )
-        
-        db.add(document)
+        document = result.scalar_one()
+        # A new document has no children yet: mark the collections as loaded (empty) so the
+        # response schema can read them without a lazy load
+        for collection in ("processing_results", "pipeline_executions"):
+            set_committed_value(document, collection, [])
         await db.commit()
-        await db.refresh(document)
         
         # --- Trigger asynchronous embedding processing --- 
         # This section is removed as processing is now triggered via a separate API endpoint
@@ -175,15 +187,16 @@ class DocumentService:
         Returns:
             Optional[DocumentResponse]: Populated response schema or None if not found.
         """
-        # Fetch the ORM object with eager loading
+        # Fetch the ORM object with eager loading. Embeddings are deliberately not loaded:
+        # DocumentResponse does not expose them and each row carries a 1536-dim vector.
         query = (
             select(Document)
             .filter(Document.id == document_id)
             .options(
-                selectinload(Document.embeddings),
                 selectinload(Document.processing_results),
+                # Each execution's pipeline is joined into the executions' SELECT
                 selectinload(Document.pipeline_executions).options(
-                    selectinload(PipelineExecution.pipeline)
+                    joinedload(PipelineExecution.pipeline)
                 )
             )
         )
@@ -358,19 +371,34 @@ class DocumentService:
         Returns:
             bool: True if deleted correctly, False if not
         """
-        document = await self.get_document(db, document_id)
-        if not document:
+        # Bulk DELETEs in one transaction instead of loading the document and letting the ORM
+        # cascade load every embedding (a 1536-dim vector each). Embeddings and processing results
+        # go with the document through their ON DELETE CASCADE foreign keys.
+        await db.execute(
+            delete(PipelineExecution)
+            .where(PipelineExecution.document_id == document_id)
+            .execution_options(synchronize_session=False)
+        )
+        deleted = (await db.execute(
+            delete(Document)
+            .where(Document.id == document_id)
+            .returning(Document.file_path, Document.user_id)
+            .execution_options(synchronize_session=False)
+        )).one_or_none()
+        if deleted is None:
+            await db.rollback()
             return False
-        
-        file_path_to_delete = Path(document.file_path) # Store path before deleting record
-        
-        await db.delete(document)
         await db.commit()
+        # Cached RAG retrievals and answers of the owner may cite the deleted document
+        await bump_documents_version(deleted.user_id)
+        
+        file_path_to_delete = Path(deleted.file_path)
         
-        # Attempt to delete the physical file after successful DB deletion
+        # Attempt to delete the physical file after successful DB deletion. The stat/unlink calls
+        # run in a worker thread (aiofiles.os) so a slow disk does not block the event loop.
         try:
-            if file_path_to_delete.exists() and file_path_to_delete.is_file():
-                os.remove(file_path_to_delete)
+            if await aiofiles.os.path.isfile(file_path_to_delete):
+                await aiofiles.os.remove(file_path_to_delete)
                 logger.info(f"Successfully deleted physical file: {file_path_to_delete}")
             else:
                 logger.warning(f"Physical file not found or is not a file, skipping deletion: {file_path_to_delete}")
@@ -397,18 +425,24 @@ class DocumentService:
         Returns:
             Optional[Document]: Updated document or None
         """
-        document = await self.get_document(db, document_id)
+        # Merge into the existing metadata in the database (jsonb ||) with one UPDATE, instead of
+        # loading the row and mutating the dict in place, which the plain JSON column does not
+        # track as a change
+        merged = func.coalesce(cast(Document.process_metadata, JSONB), cast({}, JSONB)).op("||")(
+            cast(metadata, JSONB)
+        )
+        result = await db.execute(
+            update(Document)
+            .where(Document.id == document_id)
+            .values(process_metadata=cast(merged, JSON))
+            .returning(Document)
+            .execution_options(populate_existing=True)
+        )
+        document = result.scalar_one_or_none()
         if not document:
             return None
         
-        # If there is already metadata, update instead of replacing
-        if document.process_metadata:
-            document.process_metadata.update(metadata)
-        else:
-            document.process_metadata = metadata
-        
         await db.commit()
-        await db.refresh(document)
         return document
     
     async def save_embeddings(
@@ -419,7 +453,7 @@ class DocumentService:
         chunks_text: List[str],      # Be specific: List of strings
         model: str,                  # Add model parameter
         batch_size: int = 100
-    ) -> List[DocumentEmbedding]: # Return the saved ORM objects
+    ) -> List[UUID]: # Return the IDs of the saved rows
         """
         Save the embeddings of a document in the database, replacing existing ones for the same model.
         
@@ -429,51 +463,55 @@ class DocumentService:
             embeddings: List of embedding vectors
             chunks_text: List of corresponding text chunks
             model: Name of the embedding model used
-            batch_size: Number of embeddings to save in each batch (currently unused)
+            batch_size: Rows per multi-row INSERT statement (bounds the size of each statement)
             
         Returns:
-            List[DocumentEmbedding]: List of the created DocumentEmbedding ORM objects.
+            List[UUID]: IDs of the created embedding rows, in chunk order.
         """
-        # Verify that the document exists
-        document = await db.get(Document, document_id) # Use db.get for primary key lookup
-        if not document:
-            raise ValueError(f"The document with ID {document_id} does not exist")
-        
         # Verify that there is the same number of embeddings and chunks of text
         if len(embeddings) != len(chunks_text):
             raise ValueError(f"Number of embeddings ({len(embeddings)}) does not match chunks_text ({len(chunks_text)})")
             
-        # Delete previous embeddings for the same document and model
-        # Use await db.execute with delete() - more efficient for bulk deletes
-        delete_stmt = delete(DocumentEmbedding).where(
+        # Delete previous embeddings for the same document and model and verify that the document
+        # exists in one round trip: the DELETE runs as a data-modifying CTE next to the EXISTS probe
+        deleted = delete(DocumentEmbedding).where(
             (DocumentEmbedding.document_id == document_id) &
             (DocumentEmbedding.model == model) # Use the provided model
-        )
-        await db.execute(delete_stmt)
-        logger.info(f"Deleted existing embeddings for document {document_id} and model '{model}'")
+        ).returning(DocumentEmbedding.id).cte("deleted_embeddings")
+        check = (await db.execute(select(
+            exists().where(Document.id == document_id).label("document_exists"),
+            select(func.count()).select_from(deleted).scalar_subquery().label("deleted_count"),
+        ))).one()
+        if not check.document_exists:
+            raise ValueError(f"The document with ID {document_id} does not exist")
+        logger.info(f"Deleted {check.deleted_count} existing embeddings for document {document_id} and model '{model}'")
         
-        # Save the new embeddings
-        saved_embeddings = []
-        new_embedding_objects = [] # Collect objects to add in bulk
-        for i, (embedding, chunk_text) in enumerate(zip(embeddings, chunks_text)):
-            # Create the embedding model
-            db_embedding = DocumentEmbedding(
-                document_id=document_id,
-                model=model, # Use the provided model
-                embedding=embedding,
-                chunk_index=i,
-                chunk_text=chunk_text
-            )
-            new_embedding_objects.append(db_embedding)
-            
-        db.add_all(new_embedding_objects) # Use add_all for efficiency
-        await db.flush() # Flush to assign IDs if needed before returning
+        if not embeddings:
+            return []
+
+        # Save the new embeddings with one Core INSERT (executemany / multi-row VALUES) instead of
+        # flushing an ORM object per chunk; only the generated IDs come back. Each statement carries
+        # batch_size rows: a vector is ~30KB of SQL text, so the default page of 1000 would be huge.
+        rows = [
+            {
+                "document_id": document_id,
+                "model": model, # Use the provided model
+                "embedding": embedding,
+                "chunk_index": i,
+                "chunk_text": chunk_text,
+            }
+            for i, (embedding, chunk_text) in enumerate(zip(embeddings, chunks_text))
+        ]
+        result = await db.execute(
+            insert(DocumentEmbedding).returning(DocumentEmbedding.id, sort_by_parameter_order=True),
+            rows,
+            execution_options={"insertmanyvalues_page_size": batch_size},
+        )
+        saved_ids = list(result.scalars().all())
         # No need to commit here if called within a transaction (like from the Celery task)
         # The caller (Celery task context manager) should handle the commit.
-        logger.info(f"Added {len(new_embedding_objects)} new embeddings for document {document_id} model '{model}'")
-        
-        # Return the newly created objects (they have IDs after flush)
-        return new_embedding_objects
+        logger.info(f"Added {len(saved_ids)} new embeddings for document {document_id} model '{model}'")
+        return saved_ids
     
     async def search_similar_documents(
         self, 
@@ -509,17 +547,20 @@ class DocumentService:
                 d.file_path as doc_file_path,
                 d.type as doc_type,
                 d.user_id as doc_user_id,
+                de.embedding <=> :embedding_vector AS distance,
                 1 - (de.embedding <=> :embedding_vector) AS similarity
             FROM document_embeddings de
             JOIN documents d ON de.document_id = d.id
             WHERE de.model = :model
-            AND 1 - (de.embedding <=> :embedding_vector) >= :min_similarity
+            AND de.embedding <=> :embedding_vector <= :max_distance
             """)
 
+            # The similarity threshold is expressed on the raw distance operator, like the
+            # ORDER BY, instead of on the derived similarity
             params = {
                 "embedding_vector": embedding_str,
                 "model": model,
-                "min_similarity": min_similarity
+                "max_distance": 1 - min_similarity
             }
 
             if user_id:
@@ -530,13 +571,48 @@ class DocumentService:
                 sql = text(sql.text + " AND d.id = :document_id")
                 params["document_id"] = document_id
 
-            sql = text(sql.text + " ORDER BY similarity DESC LIMIT :limit")
             params["limit"] = limit
 
+            if document_id:
+                # A single document's chunks are few and narrowed by the (document_id, model)
+                # index, so rank them exactly. The HNSW scan would collect the nearest chunks
+                # across every document and filter most of them away afterwards.
+                sql = text(sql.text + " ORDER BY distance LIMIT :limit")
+            else:
+                # Order by the raw distance operator (ascending) rather than the derived similarity
+                # so pgvector can serve the ORDER BY ... LIMIT from an ANN index. The expression
+                # matches the halfvec HNSW index; the threshold and the returned similarity stay
+                # full precision. The outer query re-ranks the candidates by exact distance.
+                sql = text(
+                    "SELECT * FROM ("
+                    + sql.text
+                    + " ORDER BY de.embedding::halfvec(1536) <=> CAST(:embedding_vector AS halfvec(1536))"
+                    + " LIMIT :limit) AS candidates ORDER BY distance"
+                )
+                # For this transaction only: the HNSW candidate list size, and iterative scans
+                # (pgvector >= 0.8) so the user and distance filters applied after the index
+                # scan do not leave fewer than :limit rows while matching chunks remain.
+                # relaxed_order may return candidates slightly out of order, hence the re-rank.
+                await db.execute(
+                    text(
+                        "SELECT set_config('hnsw.ef_search', :ef_search, true), "
+                        "set_config('hnsw.iterative_scan', 'relaxed_order', true)"
+                    ),
+                    {"ef_search": str(int(settings.RAG_HNSW_EF_SEARCH))}
+                )
+
             result = await db.execute(sql, params)
             rows = result.mappings().all()
 
-            # Format results as a list of chunks with document info
+            # Format results as a list of chunks with document info. Chunks of the same document
+            # (and, when filtered, the same user) repeat their UUIDs; each is formatted once.
+            id_strings: Dict[Any, str] = {}
+            def id_str(value) -> str:
+                formatted = id_strings.get(value)
+                if formatted is None:
+                    formatted = id_strings[value] = str(value)
+                return formatted
+
             results = []
             for row in rows:
                 results.append({
@@ -544,11 +620,11 @@ class DocumentService:
                     "chunk_index": row["chunk_index"],
                     "similarity": float(row["similarity"]),
                     "document": {
-                        "id": str(row["doc_id"]),
+                        "id": id_str(row["doc_id"]),
                         "title": row["doc_title"],
                         "file_path": row["doc_file_path"],
                         "type": row["doc_type"],
-                        "user_id": str(row["doc_user_id"])
+                        "user_id": id_str(row["doc_user_id"])
                         # Add other document fields if needed by frontend
                     }
                 })
@@ -622,13 +698,8 @@ class DocumentService:
             List[Dict[str, Any]]: List of similar documents with their score
         """
         try:
-            # Generate embedding for the query
-            logger.info(f"Generating embedding for query: {query}")
-            query_embedding = await self.generate_query_embedding(query, model)
-            
-            # Search similar documents
-            logger.info(f"Searching similar documents")
-            similar_docs = await self.search_similar_documents(
+            query_embedding = await self.embed_query(query, model)
+            similar_docs = await self.fetch_similar(
                 db=db,
                 query_embedding=query_embedding,
                 model=model,
@@ -636,13 +707,45 @@ class DocumentService:
                 min_similarity=min_similarity,
                 user_id=user_id
             )
-            
-            logger.info(f"Found {len(similar_docs)} similar results")
             return similar_docs
         except Exception as e:
             logger.error(f"Error in RAG search: {str(e)}")
             raise
-    
+
+    async def embed_query(self, query: str, model: str = "text-embedding-3-small") -> List[float]:
+        """
+        First stage of a RAG search: embed the query.
+
+        Split from rag_search so callers can start the (slow) embedding request as a task
+        and do other work while it is in flight.
+        """
+        logger.info(f"Generating embedding for query: {query}")
+        return await self.generate_query_embedding(query, model)
+
+    async def fetch_similar(
+        self,
+        db: AsyncSession,
+        query_embedding: List[float],
+        user_id: Optional[UUID] = None,
+        model: str = "text-embedding-3-small",
+        limit: int = 5,
+        min_similarity: float = 0.2
+    ) -> List[Dict[str, Any]]:
+        """
+        Second stage of a RAG search: fetch the chunks closest to an already computed embedding.
+        """
+        logger.info(f"Searching similar documents")
+        similar_docs = await self.search_similar_documents(
+            db=db,
+            query_embedding=query_embedding,
+            model=model,
+            limit=limit,
+            min_similarity=min_similarity,
+            user_id=user_id
+        )
+        logger.info(f"Found {len(similar_docs)} similar results")
+        return similar_docs
+
     async def search_documents_raw(
         self,
         db: AsyncSession,
@@ -700,14 +803,24 @@ class DocumentService:
             # await self.update_document_status(db, document_id, ProcessingStatus.FAILED)
             raise
             
-    async def update_document_status(self, db: AsyncSession, document_id: UUID, status: str):
-        """Updates the processing status of a document."""
-        stmt = select(Document).filter(Document.id == document_id)
-        result = await db.execute(stmt)
-        doc = result.scalar_one_or_none()
-        if doc:
-            doc.processing_status = status
-            await db.commit()
+    async def get_document_owner_and_status(self, db: AsyncSession, document_id: UUID) -> Optional[Tuple[UUID, Any]]:
+        """
+        Get (user_id, processing_status) of a document, or None if it does not exist.
+        Only these two columns are read: no content and no related rows.
+        """
+        result = await db.execute(
+            select(Document.user_id, Document.processing_status).where(Document.id == document_id)
+        )
+        return result.first()
+
+    async def update_document_status(self, db: AsyncSession, document_id: UUID, status: str, clear_error: bool = False):
+        """Updates the processing status of a document (UPDATE by primary key, no row load)."""
+        values = {"processing_status": status}
+        if clear_error:
+            values["error_message"] = None
+        result = await db.execute(update(Document).where(Document.id == document_id).values(**values))
+        await db.commit()
+        if result.rowcount:
             logger.info(f"Updated document {document_id} status to {status}")
         else:
             logger.warning(f"Attempted to update status for non-existent document {document_id}")
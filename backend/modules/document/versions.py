@@ -0,0 +1,37 @@
+"""
+Per-user version of the searchable document set, kept in Redis.
+
+The RAG caches (retrieved chunks and answers) are keyed on it, so bumping the version when a
+user's documents change (embeddings completed, document deleted) retires every cached entry
+built from the previous set, in every worker, without having to find and delete them.
+"""
+import logging
+from typing import Optional
+from uuid import UUID
+
+from core.redis_client import redis_cache_call
+
+logger = logging.getLogger(__name__)
+
+def _version_key(user_id: UUID) -> str:
+    return f"rag:docs_version:{user_id}"
+
+async def get_documents_version(user_id: UUID) -> Optional[int]:
+    """
+    Current document version of the user, or None when Redis is unavailable (the caches must
+    then be bypassed: a bump made meanwhile could not be seen).
+    """
+    try:
+        # INCRBY 0 reads the counter and, unlike GET, tells a missing key (0) from an open
+        # circuit breaker (None)
+        return await redis_cache_call("incrby", _version_key(user_id), 0)
+    except Exception as e:
+        logger.warning(f"Could not read the document version of user {user_id}: {e}")
+        return None
+
+async def bump_documents_version(user_id: UUID) -> None:
+    """Retire the RAG cache entries of the user after a change to their documents."""
+    try:
+        await redis_cache_call("incr", _version_key(user_id))
+    except Exception as e:
+        logger.warning(f"Could not bump the document version of user {user_id}: {e}")
@@ -1,7 +1,9 @@
 """
 Ejecutor de pipelines de documentos
 """
+import asyncio
 import logging
+from collections import OrderedDict
 from typing import Dict, Any, List, Optional
 from uuid import UUID
 
@@ -13,6 +15,28 @@ from core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Processors built from a pipeline's step configs, reused by later runs of the same pipeline version
+# (e.g. a batch over many documents). Keyed by pipeline id, updated_at and step position, so editing
+# the pipeline bumps updated_at and yields fresh processors. Processors keep no per-run state.
+_PROCESSOR_CACHE_SIZE = 256
+_processor_cache: "OrderedDict[tuple, Any]" = OrderedDict()
+
+# Processors that only read the extracted text ("document_content") from the context, so
+# consecutive steps of these types do not depend on each other
+_CONTENT_ONLY_PROCESSORS = frozenset({"summarizer", "keyword_extraction", "sentiment_analysis", "embedding"})
+
+def _get_step_processor(key: tuple, processor_type: str, config: Dict[str, Any], llm_client: Optional[LLMClientInterface]):
+    """Return the cached processor for `key`, building it with get_processor on first use."""
+    processor = _processor_cache.get(key)
+    if processor is not None:
+        _processor_cache.move_to_end(key)
+        return processor
+    processor = get_processor(processor_type, config, llm_client=llm_client)
+    _processor_cache[key] = processor
+    if len(_processor_cache) > _PROCESSOR_CACHE_SIZE:
+        _processor_cache.popitem(last=False)
+    return processor
+
 class PipelineExecutor:
     """Class to execute document processing pipelines"""
     
@@ -67,29 +91,47 @@ class PipelineExecutor:
         
         try:
             # Execute each step in order
-            for step in steps:
+            position = 0
+            while position < len(steps):
+                # Consecutive steps that only read the extracted text are independent of each other
+                # (mostly LLM calls): they run concurrently, each on its own copy of the context
+                group_end = position + 1
+                if steps[position].get("name") in _CONTENT_ONLY_PROCESSORS:
+                    while group_end < len(steps) and steps[group_end].get("name") in _CONTENT_ONLY_PROCESSORS:
+                        group_end += 1
+                group = list(enumerate(steps[position:group_end], start=position))
+
                 # Always use a fresh step context to avoid carrying connection objects
                 step_context = {k: v for k, v in self.context.items() 
                                if not k.startswith('_') and not callable(v)}
                 
                 # Pass the full document object to _execute_step
-                step_result = await self._execute_step(step, document, step_context)
-                
-                # If there is an error in the step, register it and continue with the next one
-                if "error" in step_result:
-                    # Use repr for error to potentially catch more details
-                    error_msg = f"Error in step '{step.get('name', 'unknown')}': {repr(step_result['error'])}"
-                    logger.error(error_msg)
-                    self.context["errors"].append(error_msg)
-                
-                # Save results in the context
-                step_name = step.get("name", step.get("id", "unknown_step"))
-                self.context["results"][step_name] = step_result
-                
-                # Update the context with values from the current step so they are available for the next steps
-                for key, value in step_result.items():
-                    if key not in ("error", "processor", "timestamp"):
-                        self.context[key] = value
+                step_results = await asyncio.gather(*(
+                    self._execute_step(
+                        step, document, dict(step_context),
+                        processor_key=(pipeline.id, pipeline.updated_at, index, self.llm_client)
+                    )
+                    for index, step in group
+                ))
+
+                # Results are recorded in step order, as if the steps had run one after another
+                for (index, step), step_result in zip(group, step_results):
+                    # If there is an error in the step, register it and continue with the next one
+                    if "error" in step_result:
+                        # Use repr for error to potentially catch more details
+                        error_msg = f"Error in step '{step.get('name', 'unknown')}': {repr(step_result['error'])}"
+                        logger.error(error_msg)
+                        self.context["errors"].append(error_msg)
+                    
+                    # Save results in the context
+                    step_name = step.get("name", step.get("id", "unknown_step"))
+                    self.context["results"][step_name] = step_result
+                    
+                    # Update the context with values from the current step so they are available for the next steps
+                    for key, value in step_result.items():
+                        if key not in ("error", "processor", "timestamp"):
+                            self.context[key] = value
+                position = group_end
             
             # Generate results summary
             summary = self._generate_results_summary()
@@ -110,7 +152,7 @@ class PipelineExecutor:
                          if not k.startswith('_') and not callable(v)}
         return result_context
     
-    async def _execute_step(self, step: Dict[str, Any], document: Document, step_context: Dict[str, Any] = None) -> Dict[str, Any]:
+    async def _execute_step(self, step: Dict[str, Any], document: Document, step_context: Dict[str, Any] = None, processor_key: Optional[tuple] = None) -> Dict[str, Any]:
         """
         Execute a step of the pipeline
         
@@ -118,6 +160,7 @@ class PipelineExecutor:
             step: Step configuration
             document: The full Document ORM object
             step_context: Context specific for this step (optional)
+            processor_key: Cache key of the step's processor (optional; built fresh without it)
             
         Returns:
             Dict[str, Any]: Step results
@@ -141,7 +184,10 @@ class PipelineExecutor:
             # Get the processor with the cleaned configuration
             processor_type = step.get("name", "text_extraction")
             # Pass the shared LLM client to get_processor
-            processor = get_processor(processor_type, step_config, llm_client=self.llm_client)
+            if processor_key is not None:
+                processor = _get_step_processor(processor_key, processor_type, step_config, self.llm_client)
+            else:
+                processor = get_processor(processor_type, step_config, llm_client=self.llm_client)
             
             # Execute the processor
             # ALWAYS pass the full Document object to the processor's process method.
@@ -207,7 +253,7 @@ class PipelineExecutor:
         return summary
 
 
-async def create_processing_result(db, document_id: UUID, pipeline_name: str, results: Dict[str, Any]) -> DocumentProcessingResult:
+async def create_processing_result(db, document_id: UUID, pipeline_name: str, results: Dict[str, Any], encoded_results=None) -> DocumentProcessingResult:
     """
     Save the processing results in the database
     
@@ -216,6 +262,8 @@ async def create_processing_result(db, document_id: UUID, pipeline_name: str, re
         document_id: ID of the document
         pipeline_name: Name of the pipeline
         results: Processing results
+        encoded_results: Optional pre-encoded results (database.session.encoded_json) to store
+            instead of encoding `results` again
         
     Returns:
         DocumentProcessingResult: Results record
@@ -256,13 +304,13 @@ async def create_processing_result(db, document_id: UUID, pipeline_name: str, re
         summary=summary,
         keywords=keywords,
         token_count=token_count,
-        process_metadata=results
+        process_metadata=encoded_results if encoded_results is not None else results
     )
     
-    # Save in database
+    # Save in database (the primary key is generated client-side, so no refresh is needed).
+    # Only flushed: the caller commits it together with the execution's final status.
     db.add(result)
-    await db.commit()
-    await db.refresh(result)
+    await db.flush()
     
     logger.info(f"Created DocumentProcessingResult with summary length: {len(summary) if summary else 0}, keywords: {len(keywords)}")
     
@@ -38,10 +38,39 @@ except ImportError:
     docx = None
     logging.warning("python-docx not installed. DOCX extraction will not work.")
 
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+    logging.warning("tiktoken not installed. Embedding chunks will be split by characters.")
+
+from functools import lru_cache
+
 from database.models.document import Document
 
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=None)
+def _get_token_encoding(model: str):
+    """Tokenizer of an embedding model (loading an encoding is expensive, so it is built once)."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # Current OpenAI embedding models all use cl100k_base
+        return tiktoken.get_encoding("cl100k_base")
+
+def _read_pdf(file_path: str) -> str:
+    """Extract the text of a PDF (blocking; run it in an executor)."""
+    with open(file_path, 'rb') as f:
+        reader = PdfReader(f)
+        page_texts = (page.extract_text() for page in reader.pages)
+        return '\n'.join(text for text in page_texts if text)
+
+def _read_docx(file_path: str) -> str:
+    """Extract the paragraph text of a DOCX file (blocking; run it in an executor)."""
+    doc = docx.Document(file_path)
+    return '\n'.join(para.text for para in doc.paragraphs if para.text)
+
 class BaseProcessor(ABC):
     """Base class for pipeline processors"""
     
@@ -97,11 +126,7 @@ class TextExtractionProcessor(BaseProcessor):
                 elif file_ext == '.pdf':
                     if PdfReader:
                         try:
-                            def read_pdf(): # Function to run in thread pool
-                                with open(file_path, 'rb') as f:
-                                    reader = PdfReader(f)
-                                    return '\n'.join([page.extract_text() for page in reader.pages if page.extract_text()])
-                            extracted_text = await loop.run_in_executor(None, read_pdf) # Run sync code in thread pool
+                            extracted_text = await loop.run_in_executor(None, _read_pdf, str(file_path)) # Run sync code in thread pool
                         except Exception as pdf_err:
                             error_msg = f"Error reading PDF file: {pdf_err}"
                             logger.error(error_msg, exc_info=True)
@@ -112,10 +137,7 @@ class TextExtractionProcessor(BaseProcessor):
                 elif file_ext in ['.docx']:
                     if docx:
                         try:
-                            def read_docx(): # Function to run in thread pool
-                                doc = docx.Document(file_path)
-                                return '\n'.join([para.text for para in doc.paragraphs if para.text])
-                            extracted_text = await loop.run_in_executor(None, read_docx) # Run sync code in thread pool
+                            extracted_text = await loop.run_in_executor(None, _read_docx, str(file_path)) # Run sync code in thread pool
                         except Exception as docx_err:
                              error_msg = f"Error reading DOCX file: {docx_err}"
                              logger.error(error_msg, exc_info=True)
@@ -186,6 +208,38 @@ class SummarizerProcessor(BaseProcessor):
         self.max_chunk_tokens = self.config.get("max_chunk_tokens", 12000)  # Tamaño máximo por chunk
         logger.info(f"{self.name} will use model: {self.model}")
     
+    @staticmethod
+    def _pack_pieces(pieces: List[str], separator: str, max_chars: int) -> List[str]:
+        """
+        Agrupa piezas consecutivas en chunks de como máximo max_chars caracteres.
+        
+        Cada chunk se acumula como lista y se une una sola vez, en lugar de concatenar
+        el string en cada iteración (coste cuadrático con textos largos).
+        """
+        chunks = []
+        current_parts: List[str] = []
+        current_len = 0
+        
+        separator_len = len(separator)
+        for piece in pieces:
+            piece_len = len(piece)
+            # Si añadir esta pieza excedería el límite, guardar el chunk actual y empezar uno nuevo
+            if current_len + piece_len > max_chars and current_len:
+                chunks.append(separator.join(current_parts).strip())
+                current_parts = [piece]
+                current_len = piece_len
+            elif current_len:
+                current_parts.append(piece)
+                current_len += separator_len + piece_len
+            else:
+                current_parts = [piece]
+                current_len = piece_len
+        
+        # Añadir el último chunk si no está vacío
+        if current_len:
+            chunks.append(separator.join(current_parts).strip())
+        return chunks
+    
     def _chunk_text(self, text: str, max_tokens: int = 12000) -> List[str]:
         """
         Divide el texto en chunks más pequeños para evitar exceder los límites del modelo.
@@ -205,24 +259,7 @@ class SummarizerProcessor(BaseProcessor):
             return [text]
         
         # Dividir por párrafos primero
-        paragraphs = text.split('\n')
-        chunks = []
-        current_chunk = ""
-        
-        for paragraph in paragraphs:
-            # Si añadir este párrafo excedería el límite, guardar el chunk actual y empezar uno nuevo
-            if len(current_chunk) + len(paragraph) > max_chars and current_chunk:
-                chunks.append(current_chunk.strip())
-                current_chunk = paragraph
-            else:
-                if current_chunk:
-                    current_chunk += "\n" + paragraph
-                else:
-                    current_chunk = paragraph
-        
-        # Añadir el último chunk si no está vacío
-        if current_chunk:
-            chunks.append(current_chunk.strip())
+        chunks = self._pack_pieces(text.split('\n'), "\n", max_chars)
         
         # Si algún párrafo individual es demasiado grande, dividirlo por oraciones
         if any(len(chunk) > max_chars for chunk in chunks):
@@ -231,18 +268,7 @@ class SummarizerProcessor(BaseProcessor):
                 if len(chunk) > max_chars:
                     # Dividir por oraciones (aproximadamente)
                     sentences = re.split(r'(?<=[.!?])\s+', chunk)
-                    sub_chunk = ""
-                    for sentence in sentences:
-                        if len(sub_chunk) + len(sentence) > max_chars and sub_chunk:
-                            refined_chunks.append(sub_chunk.strip())
-                            sub_chunk = sentence
-                        else:
-                            if sub_chunk:
-                                sub_chunk += " " + sentence
-                            else:
-                                sub_chunk = sentence
-                    if sub_chunk:
-                        refined_chunks.append(sub_chunk.strip())
+                    refined_chunks.extend(self._pack_pieces(sentences, " ", max_chars))
                 else:
                     refined_chunks.append(chunk)
             chunks = refined_chunks
@@ -497,14 +523,20 @@ class EmbeddingProcessor(BaseProcessor):
     def __init__(self, config: Optional[Dict[str, Any]] = None, llm_client: Optional[LLMClientInterface] = None):
         super().__init__(config, llm_client)
         self.model = self.config.get("model", "text-embedding-3-small")
-        self.chunk_size = self.config.get("chunk_size", 1000)
-        self.chunk_overlap = self.config.get("chunk_overlap", 200)
+        self.chunk_size = self.config.get("chunk_size", 512)
+        self.chunk_overlap = self.config.get("chunk_overlap", 128)
         logger.info(f"{self.name} initialized. Model: {self.model}, ChunkSize: {self.chunk_size}, Overlap: {self.chunk_overlap}")
         if not self.llm_client:
             logger.warning(f"{self.name} initialized without LLM client. Embedding generation will fail.")
 
     def _chunk_text(self, text: str) -> List[str]:
-        """Split text into chunks based on character count with overlap."""
+        """
+        Split text into chunks of chunk_size tokens with chunk_overlap tokens of overlap.
+
+        The text is tokenized once and chunk i is tokens[i*stride : i*stride + chunk_size], with
+        stride = chunk_size - chunk_overlap, so every chunk has an exact token count for the
+        embedding model. Without tiktoken the same window is applied to characters.
+        """
         if not text:
             return []
 
@@ -516,6 +548,9 @@ class EmbeddingProcessor(BaseProcessor):
             logger.warning(f"Chunk overlap ({chunk_overlap}) is greater than or equal to chunk size ({chunk_size}). Setting overlap to {chunk_size // 2}.")
             chunk_overlap = chunk_size // 2 # Adjust to a reasonable default like half the chunk size
 
+        if tiktoken is not None:
+            return self._chunk_tokens(text, chunk_size, chunk_overlap)
+
         logger.info(f"Chunking text with character chunk_size={chunk_size}, chunk_overlap={chunk_overlap}")
 
         chunks = []
@@ -546,8 +581,52 @@ class EmbeddingProcessor(BaseProcessor):
         logger.info(f"Chunked text into {len(chunks)} chunks using character-based splitting with overlap.")
         return chunks
 
+    def _chunk_tokens(self, text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+        """Sliding window over the token ids of the text (tokenized once)."""
+        encoding = _get_token_encoding(self.model)
+        tokens = encoding.encode(text, disallowed_special=())
+        token_count = len(tokens)
+        stride = max(chunk_size - chunk_overlap, 1)
+
+        chunks = []
+        for start in range(0, token_count, stride):
+            # errors="ignore" drops a multi-byte character split at a window edge
+            chunks.append(encoding.decode(tokens[start:start + chunk_size], errors="ignore"))
+            if start + chunk_size >= token_count:
+                break
+
+        logger.info(f"Chunked {token_count} tokens into {len(chunks)} chunks (chunk_size={chunk_size}, chunk_overlap={chunk_overlap} tokens).")
+        return chunks
+
+    async def _generate_embeddings_cached(self, db, chunks: List[str]) -> List[List[float]]:
+        """Generate embeddings through the persistent embedding cache; only uncached chunks hit the API."""
+        from modules.document.embedding_cache import content_hash, get_cached_embeddings, store_embeddings
+
+        hashes = [content_hash(chunk) for chunk in chunks]
+        embeddings_by_hash = await get_cached_embeddings(db, self.model, set(hashes))
+
+        # Unique uncached texts, so repeated chunks are also embedded only once
+        missing: Dict[str, str] = {}
+        for chunk_hash, chunk in zip(hashes, chunks):
+            if chunk_hash not in embeddings_by_hash and chunk_hash not in missing:
+                missing[chunk_hash] = chunk
+        logger.info(f"{len(chunks) - len(missing)} of {len(chunks)} chunk embeddings served from the cache")
+
+        if missing:
+            fresh = await self.llm_client.generate_embeddings(texts=list(missing.values()), model=self.model)
+            if not fresh or len(fresh) != len(missing):
+                raise ValueError("Embedding generation failed or returned incorrect number of vectors.")
+            fresh_by_hash = dict(zip(missing, fresh))
+            await store_embeddings(db, self.model, fresh_by_hash)
+            embeddings_by_hash.update(fresh_by_hash)
+
+        return [embeddings_by_hash[chunk_hash] for chunk_hash in hashes]
+
     async def process(self, document: Document, context: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate embeddings for document text (obtained from context or document)"""
+        """
+        Generate embeddings for document text (obtained from context or document).
+        When the context carries a "db_session", embeddings go through the persistent embedding cache.
+        """
         try:
             # Get text from context (preferred) or document object
             # Use 'document_content' key as populated by TextExtractionProcessor
@@ -572,10 +651,14 @@ class EmbeddingProcessor(BaseProcessor):
             logger.info(f"Generating embeddings for {chunk_count} chunks using model {self.model}...")
             
             # Generate embeddings using the LLM client interface
-            embeddings = await self.llm_client.generate_embeddings(
-                texts=chunks,
-                model=self.model
-            )
+            db_session = context.get("db_session")
+            if db_session is not None:
+                embeddings = await self._generate_embeddings_cached(db_session, chunks)
+            else:
+                embeddings = await self.llm_client.generate_embeddings(
+                    texts=chunks,
+                    model=self.model
+                )
 
             if not embeddings or len(embeddings) != chunk_count:
                  logger.error(f"LLM client failed to return valid embeddings. Expected {chunk_count}, got {len(embeddings) if embeddings else 0}")
@@ -2,8 +2,8 @@ from typing import Dict, Any, Optional, List
 from datetime import datetime
 import uuid
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc, and_, delete
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, desc, and_, delete, exists, insert
+from sqlalchemy.orm import joinedload
 
 from database.models.user import User
 from database.models.pipeline import Pipeline, PipelineExecution, ExecutionStatus
@@ -98,9 +98,7 @@ class PipelineService:
     async def get_pipeline(self, db: AsyncSession, pipeline_id: uuid.UUID, user: User) -> Optional[Pipeline]:
         """Gets a single pipeline configuration by ID, checking permissions."""
         logger.info(f"Fetching pipeline config {pipeline_id} for user {user.id}")
-        query = select(Pipeline).where(Pipeline.id == pipeline_id)
-        result = await db.execute(query)
-        pipeline = result.scalar_one_or_none()
+        pipeline = await db.get(Pipeline, pipeline_id)
 
         if not pipeline:
             return None
@@ -114,9 +112,7 @@ class PipelineService:
     async def update_pipeline(self, db: AsyncSession, pipeline_id: uuid.UUID, pipeline_data: PipelineConfigUpdate, user: User) -> Optional[Pipeline]:
         """Updates a pipeline configuration, checking permissions."""
         logger.info(f"Updating pipeline config {pipeline_id} for user {user.id}")
-        query = select(Pipeline).where(Pipeline.id == pipeline_id)
-        result = await db.execute(query)
-        db_pipeline = result.scalar_one_or_none()
+        db_pipeline = await db.get(Pipeline, pipeline_id)
 
         if not db_pipeline:
             return None
@@ -162,9 +158,7 @@ class PipelineService:
     async def delete_pipeline(self, db: AsyncSession, pipeline_id: uuid.UUID, user: User) -> bool:
         """Deletes a pipeline configuration, checking permissions."""
         logger.info(f"Deleting pipeline config {pipeline_id} requested by user {user.id}")
-        query = select(Pipeline).where(Pipeline.id == pipeline_id)
-        result = await db.execute(query)
-        db_pipeline = result.scalar_one_or_none()
+        db_pipeline = await db.get(Pipeline, pipeline_id)
 
         if not db_pipeline:
             return False
@@ -190,9 +184,10 @@ class PipelineService:
         result = await db.execute(
             select(PipelineExecution)
             .where(PipelineExecution.id == execution_id)
+            # Many-to-one: join them into the same SELECT instead of one extra query each
             .options(
-                selectinload(PipelineExecution.pipeline),
-                selectinload(PipelineExecution.document)
+                joinedload(PipelineExecution.pipeline),
+                joinedload(PipelineExecution.document)
             )
         )
         execution = result.scalar_one_or_none()
@@ -218,9 +213,10 @@ class PipelineService:
         user: Optional[User] = None
     ) -> List[PipelineExecution]:
         """Get executions, filtered by document, pipeline, status, and user permissions."""
+        # Pipeline and document are many-to-one, so they are joined into the page query
         query = select(PipelineExecution).options(
-            selectinload(PipelineExecution.pipeline),
-            selectinload(PipelineExecution.document)
+            joinedload(PipelineExecution.pipeline),
+            joinedload(PipelineExecution.document)
         )
 
         conditions = []
@@ -277,8 +273,7 @@ class PipelineService:
         error_message: Optional[str] = None
     ) -> Optional[PipelineExecution]:
         """Update the status of an execution"""
-        result = await db.execute(select(PipelineExecution).where(PipelineExecution.id == execution_id))
-        execution = result.scalar_one_or_none()
+        execution = await db.get(PipelineExecution, execution_id)
         if not execution:
             return None
 
@@ -300,8 +295,7 @@ class PipelineService:
         results: Dict[str, Any]
     ) -> Optional[PipelineExecution]:
         """Update the results of an execution"""
-        result = await db.execute(select(PipelineExecution).where(PipelineExecution.id == execution_id))
-        execution = result.scalar_one_or_none()
+        execution = await db.get(PipelineExecution, execution_id)
         if not execution:
             return None
 
@@ -317,8 +311,7 @@ class PipelineService:
         execution_id: uuid.UUID
     ) -> Optional[PipelineExecution]:
         """Mark an execution as started"""
-        result = await db.execute(select(PipelineExecution).where(PipelineExecution.id == execution_id))
-        execution = result.scalar_one_or_none()
+        execution = await db.get(PipelineExecution, execution_id)
         if not execution:
             return None
 
@@ -360,14 +353,42 @@ class PipelineService:
         user: User,
         parameters: Optional[Dict[str, Any]] = None
     ) -> List[PipelineExecution]:
-        """Create multiple executions for a pipeline"""
-        executions = []
-        for doc_id in document_ids:
-            exec_data = PipelineExecutionCreate(
-                pipeline_id=pipeline_id,
-                document_id=doc_id,
-                parameters=parameters
+        """Create multiple executions for a pipeline with a single multi-row INSERT"""
+        if not await db.scalar(select(exists().where(Pipeline.id == pipeline_id))):
+            raise ValueError(f"Pipeline configuration with ID {pipeline_id} not found.")
+        if not document_ids:
+            return []
+
+        # Check that every document exists and belongs to the user with one IN query
+        owners = dict((await db.execute(
+            select(Document.id, Document.user_id).where(Document.id.in_(set(document_ids)))
+        )).all())
+        missing = [str(doc_id) for doc_id in document_ids if doc_id not in owners]
+        if missing:
+            raise ValueError(f"Documents not found: {', '.join(missing)}")
+        if user.role != "admin" and any(owner_id != user.id for owner_id in owners.values()):
+            raise PermissionError("User does not have permission to process all of these documents.")
+
+        rows = [
+            {
+                "pipeline_id": pipeline_id,
+                "document_id": doc_id,
+                "status": ExecutionStatus.PENDING,
+                "parameters": parameters,
+                "user_id": user.id,
+            }
+            for doc_id in document_ids
+        ]
+        try:
+            result = await db.scalars(
+                insert(PipelineExecution).returning(PipelineExecution, sort_by_parameter_order=True),
+                rows
             )
-            execution = await self.create_execution(db, exec_data, user)
-            executions.append(execution)
-        return executions 
\ No newline at end of file
+            executions = list(result.all())
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Database error creating batch executions for pipeline {pipeline_id}: {e}", exc_info=True)
+            raise ValueError(f"Failed to create pipeline executions: {e}")
+        logger.info(f"Created {len(executions)} pipeline executions for pipeline {pipeline_id}")
+        return executions
@@ -1,9 +1,8 @@
 import logging
 from typing import Dict, Any, List
 from datetime import datetime, timedelta
-import asyncio
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import func, select, and_, text
+from sqlalchemy import func, select, and_, text, true
 
 from database.models.user import User
 from database.models.document import Document
@@ -39,21 +38,30 @@ class StatsService:
         """Calculates and returns data for the main dashboard."""
         logger.info("Calculating dashboard statistics...")
         try:
-            week_ago = datetime.utcnow() - timedelta(days=7)
-            two_weeks_ago = datetime.utcnow() - timedelta(days=14)
+            now = datetime.utcnow()
+            week_ago = now - timedelta(days=7)
+            two_weeks_ago = now - timedelta(days=14)
 
             # --- Counts ---
-            total_users_fut = db.scalar(select(func.count()).select_from(User))
-            new_users_week_fut = db.scalar(select(func.count()).select_from(User).where(User.created_at >= week_ago))
-            prev_week_users_fut = db.scalar(select(func.count()).select_from(User).where(and_(User.created_at >= two_weeks_ago, User.created_at < week_ago)))
-
-            total_docs_fut = db.scalar(select(func.count()).select_from(Document))
-            new_docs_week_fut = db.scalar(select(func.count()).select_from(Document).where(Document.created_at >= week_ago))
-            prev_week_docs_fut = db.scalar(select(func.count()).select_from(Document).where(and_(Document.created_at >= two_weeks_ago, Document.created_at < week_ago)))
+            # Total, this week and previous week of a table in one scan (COUNT ... FILTER)
+            def count_summary(model_cls, date_column):
+                return (
+                    select(
+                        func.count().label('total'),
+                        func.count().filter(date_column >= week_ago).label('new_week'),
+                        func.count().filter(and_(date_column >= two_weeks_ago, date_column < week_ago)).label('prev_week'),
+                    )
+                    .select_from(model_cls)
+                    .subquery()
+                )
 
-            total_executions_fut = db.scalar(select(func.count()).select_from(PipelineExecution))
-            new_executions_week_fut = db.scalar(select(func.count()).select_from(PipelineExecution).where(PipelineExecution.created_at >= week_ago))
-            prev_week_executions_fut = db.scalar(select(func.count()).select_from(PipelineExecution).where(and_(PipelineExecution.created_at >= two_weeks_ago, PipelineExecution.created_at < week_ago)))
+            # The three single-row summaries are cross joined into one statement (one round-trip)
+            users_counts = count_summary(User, User.created_at)
+            docs_counts = count_summary(Document, Document.created_at)
+            executions_counts = count_summary(PipelineExecution, PipelineExecution.created_at)
+            counts_query = select(users_counts, docs_counts, executions_counts).select_from(
+                users_counts.join(docs_counts, true()).join(executions_counts, true())
+            )
 
             # --- Recent Activity ---
             recent_activity_query = (
@@ -68,7 +76,7 @@ class StatsService:
                 .order_by(PipelineExecution.created_at.desc())
                 .limit(5)
             )
-            recent_activity_result_fut = db.execute(recent_activity_query)
+
 
             # --- Monthly Stats (Raw SQL - potentially adapt based on DB) ---
             # Note: Using recursive CTE might not be portable. Consider alternatives if needed.
@@ -84,25 +92,22 @@ class StatsService:
                 months.month,
                 COALESCE(COUNT(pe.id), 0) as count
             FROM months
+            -- created_at holds UTC; a range (not date_trunc over the column) can use its index
             LEFT JOIN pipeline_executions pe
-                ON date_trunc('month', pe.created_at at time zone 'utc') = months.month
+                ON pe.created_at >= months.month
+                AND pe.created_at < months.month + interval '1 month'
             GROUP BY months.month
             ORDER BY months.month DESC;
             """) # Ensure timezone handling is consistent (UTC used here)
-            monthly_stats_result_fut = db.execute(months_query)
 
-            # --- Await all futures ---
+            # --- Run the queries (an AsyncSession runs one statement at a time) ---
             (
                 total_users, new_users_week, prev_week_users,
                 total_docs, new_docs_week, prev_week_docs,
                 total_executions, new_executions_week, prev_week_executions,
-                recent_activity_result, monthly_stats_result
-            ) = await asyncio.gather(
-                total_users_fut, new_users_week_fut, prev_week_users_fut,
-                total_docs_fut, new_docs_week_fut, prev_week_docs_fut,
-                total_executions_fut, new_executions_week_fut, prev_week_executions_fut,
-                recent_activity_result_fut, monthly_stats_result_fut
-            )
+            ) = (await db.execute(counts_query)).one()
+            recent_activity_result = await db.execute(recent_activity_query)
+            monthly_stats_result = await db.execute(months_query)
 
             # --- Process Results ---
             users_change = self._calculate_percentage_change(new_users_week, prev_week_users)
@@ -122,7 +127,7 @@ class StatsService:
             # Process monthly stats, ensuring correct month order if needed
             monthly_stats_raw = {row.month.strftime('%Y-%m'): row.count for row in monthly_stats_result}
             # Generate last 6 months keys in order if needed for frontend chart consistency
-            monthly_keys_ordered = [(datetime.utcnow() - timedelta(days=30 * i)).strftime('%Y-%m') for i in range(5, -1, -1)]
+            monthly_keys_ordered = [(now - timedelta(days=30 * i)).strftime('%Y-%m') for i in range(5, -1, -1)]
             monthly_stats_ordered = {key.split('-')[1]: monthly_stats_raw.get(key, 0) for key in monthly_keys_ordered} # Use month number or abbreviation
 
 
@@ -162,9 +167,10 @@ class StatsService:
                 result = await db.execute(query)
                 return {row.month.strftime('%Y-%m'): row.count for row in result}
 
-            users_data_fut = fetch_monthly_counts(User, User.created_at)
-            docs_data_fut = fetch_monthly_counts(Document, Document.created_at)
-            executions_data_fut = fetch_monthly_counts(PipelineExecution, PipelineExecution.created_at)
+            # Awaited one after the other: an AsyncSession does not support concurrent queries
+            users_data = await fetch_monthly_counts(User, User.created_at)
+            docs_data = await fetch_monthly_counts(Document, Document.created_at)
+            executions_data = await fetch_monthly_counts(PipelineExecution, PipelineExecution.created_at)
 
             # --- Document Type Distribution ---
             doc_types_query = (
@@ -174,7 +180,7 @@ class StatsService:
                 )
                 .group_by(Document.type)
             )
-            doc_types_result_fut = db.execute(doc_types_query)
+            doc_types_result = await db.execute(doc_types_query)
 
             # --- Weekly Data (Last 7 days by day) ---
              # Example for executions (adapt for users/docs if needed)
@@ -191,17 +197,7 @@ class StatsService:
                 .group_by(day_trunc) # Group by the same labeled expression\
                 .order_by('day') # Order by the label\
             ) # Added closing parenthesis
-            daily_executions_result_fut = db.execute(daily_executions_query)
-
-
-            # --- Await Futures ---
-            (
-                users_data, docs_data, executions_data,
-                doc_types_result, daily_executions_result
-            ) = await asyncio.gather(
-                 users_data_fut, docs_data_fut, executions_data_fut,
-                 doc_types_result_fut, daily_executions_result_fut
-            )
+            daily_executions_result = await db.execute(daily_executions_query)
 
             # --- Process Results ---
             doc_types_data = {row.type or "Unknown": row.count for row in doc_types_result} # Handle null type
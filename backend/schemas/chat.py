@@ -1,6 +1,6 @@
 from typing import List, Optional, Dict
 from datetime import datetime
-from pydantic import BaseModel, Field, UUID4
+from pydantic import BaseModel, Field, UUID4, field_validator, model_validator
 from uuid import UUID
 
 class MessageCreate(BaseModel):
@@ -55,6 +55,13 @@ class ChatRequest(BaseModel):
     model: Optional[str] = Field(None, description="Model to use")
     temperature: float = Field(0.7, description="Temperatura para sampling (0-1)", ge=0, le=1)
     
+    @model_validator(mode="after")
+    def check_message_present(self):
+        # Reject empty turns here, before any conversation lookup, DB write or LLM call
+        if not (self.get_message() or "").strip():
+            raise ValueError("A non-empty 'message' or 'content' is required.")
+        return self
+
     def get_message(self) -> str:
         """Get the user message, either from the 'message' field or 'content' field"""
         return self.message if self.message else self.content
@@ -73,6 +80,14 @@ class RagRequest(BaseModel):
     query: str
     conversation_id: Optional[UUID] = None
 
+    @field_validator("query")
+    @classmethod
+    def check_query_not_blank(cls, value: str) -> str:
+        # A blank query would still cost an embedding request and a vector search
+        if not value.strip():
+            raise ValueError("The query must not be empty.")
+        return value
+
 class RagResponse(BaseModel):
     answer: str
     sources: List[DocumentSource]
@@ -49,6 +49,13 @@ class SearchRequest(BaseModel):
     min_similarity: float = Field(0.5, ge=0.0, le=1.0, description="Minimum similarity score (0 to 1).")
     document_id: Optional[UUID] = Field(None, description="Optional document ID to filter search within a specific document.")
 
+    @validator('query')
+    def check_query_not_blank(cls, value):
+        # A blank query would still cost an embedding request and a vector search
+        if not value.strip():
+            raise ValueError("The query must not be empty.")
+        return value
+
 class DocumentProcessingResultResponse(BaseModel):
     id: Optional[UUID] = None # Allow None for synthesized results
     document_id: UUID
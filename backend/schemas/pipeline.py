@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from pydantic import validator
-import json
+import orjson
 from typing import List, Dict, Any, Optional, Union
 from datetime import datetime
 from enum import Enum
@@ -82,8 +82,8 @@ class PipelineExecutionResponse(PipelineExecutionBase):
             return v # Already a dict, accept it
         if isinstance(v, str):
             try:
-                return json.loads(v) # Parse JSON string
-            except json.JSONDecodeError:
+                return orjson.loads(v) # Parse JSON string (orjson: listing executions parses one per row)
+            except orjson.JSONDecodeError:
                 raise ValueError("Invalid JSON string provided for results")
         raise ValueError("Results must be a dictionary or a valid JSON string")
 
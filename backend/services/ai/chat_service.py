@@ -1,11 +1,15 @@
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Optional, List, Tuple, Callable, Awaitable
 import uuid
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import desc
-import json
+from sqlalchemy import delete, desc, exists, func, insert, literal, text, true, union_all, update
+import orjson
 import logging
+import asyncio
+import hashlib
+import functools
+import numpy as np
 
 from core.config import settings
 from database.models.conversation import Conversation, Message
@@ -13,9 +17,104 @@ from database.models.user import User
 from database.models.document import Document
 from modules.document.service import DocumentService
 from core.llm_interface import LLMClientInterface, LLMMessage
+from services.ai.semantic_cache import SemanticResponseCache, ProximityCache, EmbeddingCache
+from services.ai.conversation_cache import ConversationHistoryCache
+from services.ai.embedding_batcher import BatchingEmbedder
+from modules.document.versions import get_documents_version
+from core.redis_client import redis_cache_call
+from database.session import get_async_session_context
 
 logger = logging.getLogger(__name__)
 
+# Chat completions above this temperature are not deterministic enough to cache
+CHAT_CACHE_MAX_TEMPERATURE = 0.3
+
+# Layout of each retrieved chunk inside the RAG context
+_CHUNK_TMPL = "[{title} - Chunk {chunk_index}]\n{chunk_text}"
+
+
+# Server-sent events framing for the chat stream
+SSE_KEEPALIVE_SECONDS = 15
+SSE_KEEPALIVE = b": keepalive\n\n"
+SSE_DONE = b"data: [DONE]\n\n"
+# How often (in streamed chunks) the client connection is checked while streaming
+DISCONNECT_CHECK_INTERVAL = 10
+
+
+def sse_event(payload: Dict[str, Any]) -> bytes:
+    """Encode a payload as an SSE data event."""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+
+async def _iter_with_keepalive(stream, interval: float):
+    """
+    Iterate an async stream, yielding None whenever no item arrived for `interval` seconds.
+
+    The pending __anext__ is awaited through asyncio.wait rather than wait_for, so a keepalive
+    tick never cancels (and thereby closes) the underlying stream.
+    """
+    iterator = stream.__aiter__()
+    pending = asyncio.ensure_future(iterator.__anext__())
+    try:
+        while True:
+            done, _ = await asyncio.wait({pending}, timeout=interval)
+            if not done:
+                yield None
+                continue
+            try:
+                item = pending.result()
+            except StopAsyncIteration:
+                return
+            pending = asyncio.ensure_future(iterator.__anext__())
+            yield item
+    finally:
+        if not pending.done():
+            pending.cancel()
+            # Let the cancellation finish so the stream can be closed afterwards
+            try:
+                await pending
+            except (asyncio.CancelledError, StopAsyncIteration, Exception):
+                pass
+
+
+def _title_for(message: str, max_length: int = 30) -> str:
+    """Conversation title derived from its first message."""
+    return message if len(message) <= max_length else message[:max_length] + "..."
+
+
+def _trim_history(
+    messages: List[Dict[str, str]],
+    total_count: int,
+    summary: Optional[str] = None,
+    summarized_count: int = 0
+) -> Tuple[List[Dict[str, str]], bool]:
+    """
+    Bound the history sent to the LLM.
+
+    `messages` are the most recent messages of a conversation that has `total_count` messages,
+    the first `summarized_count` of which are covered by the running `summary`. Only covered
+    messages older than the last CHAT_WINDOW_MESSAGES are left out, so a message is never missing
+    from both the summary and the context. System messages are always kept, and the summary (if
+    any) is prepended as a system message. Returns (messages, summary_due) where `summary_due`
+    tells whether CHAT_SUMMARY_MIN_NEW_MESSAGES uncovered messages have left the window.
+    """
+    window = settings.CHAT_WINDOW_MESSAGES
+    if not summary:
+        summarized_count = 0
+    # Conversation position of messages[0]; everything before keep_from is covered by the summary
+    first_position = total_count - len(messages)
+    keep_from = max(min(summarized_count, total_count - window) - first_position, 0)
+    system = [m for m in messages[:keep_from] if m["role"] == "system"]
+    if summary:
+        system = [{"role": "system", "content": f"Summary of the conversation so far:\n{summary}"}] + system
+    summary_due = total_count - window - summarized_count >= settings.CHAT_SUMMARY_MIN_NEW_MESSAGES
+    return system + messages[keep_from:], summary_due
+
+
+def _chunk_canonical_key(chunk: Dict[str, Any]) -> Tuple[str, int]:
+    """Canonical (document_id, chunk_index) ordering key for a retrieved chunk."""
+    return (str(chunk.get("document", {}).get("id", "")), chunk.get("chunk_index") or 0)
+
 class ChatService:
     """Service for chat with AI assistant, RAG, and conversation management."""
     
@@ -31,6 +130,48 @@ class ChatService:
         self.llm_client = llm_client
         self.document_service = document_service
         self.default_model = settings.DEFAULT_CHAT_MODEL or "gpt-4"
+        # Chat completion call bound once to the default model; callers pass model= only to override it
+        self._chat_completion = (
+            functools.partial(self.llm_client.generate_chat_completion, model=self.default_model)
+            if self.llm_client else None
+        )
+        # Cache of RAG answers for near-duplicate questions (per user)
+        self.response_cache = SemanticResponseCache(
+            max_size=settings.RAG_SEMANTIC_CACHE_SIZE,
+            threshold=settings.RAG_SEMANTIC_CACHE_THRESHOLD,
+            ttl_seconds=settings.RAG_SEMANTIC_CACHE_TTL
+        )
+        # Embeddings of repeated query texts (in-process + Redis, shared across workers)
+        self.embedding_cache = EmbeddingCache(
+            max_size=settings.EMBEDDING_CACHE_SIZE,
+            ttl_seconds=settings.EMBEDDING_CACHE_TTL
+        )
+        # Query embeddings requested concurrently are sent to the API in one batched call
+        self.embedding_batcher = (
+            BatchingEmbedder(
+                self.llm_client.generate_embeddings,
+                max_batch_size=settings.EMBEDDING_BATCH_SIZE,
+                max_wait_seconds=settings.EMBEDDING_BATCH_WINDOW_MS / 1000
+            )
+            if self.llm_client else None
+        )
+        # Retrieved chunks for nearby questions (per user)
+        self.retrieval_cache = ProximityCache(
+            capacity=settings.RAG_RETRIEVAL_CACHE_SIZE,
+            tau=settings.RAG_RETRIEVAL_CACHE_TAU,
+            ttl_seconds=settings.RAG_RETRIEVAL_CACHE_TTL
+        )
+        # Recent LLM history per conversation, so a turn does not re-read it from the database
+        self.history_cache = ConversationHistoryCache(
+            max_size=settings.CHAT_HISTORY_CACHE_SIZE,
+            ttl_seconds=settings.CHAT_HISTORY_CACHE_TTL,
+            window=settings.CHAT_CONTEXT_MESSAGES
+        )
+        # RAG answers currently being generated, so identical concurrent questions share one LLM call
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # Fire-and-forget persistence and cache-write tasks, referenced until done so they are not
+        # garbage collected
+        self._background_tasks: set = set()
 
         # Log a warning if the essential OpenAI client is missing
         if not self.llm_client:
@@ -48,67 +189,161 @@ class ChatService:
         return result.scalars().first()
     
     async def get_user_conversations(self, db: AsyncSession, user_id: uuid.UUID):
-        """Get all conversations of a user"""
+        """
+        Get all conversations of a user, as read-only rows with the listed columns only (no
+        mapped objects in the identity map, no summary or description text)
+        """
         result = await db.execute(
-            select(Conversation)
+            select(Conversation.id, Conversation.title, Conversation.created_at, Conversation.updated_at)
             .where(Conversation.user_id == user_id)
             .order_by(desc(Conversation.updated_at))
         )
-        return result.scalars().all()
+        return result.all()
     
     async def create_conversation(self, db: AsyncSession, user_id: uuid.UUID, title: str):
         """Create a new conversation"""
-        conversation = Conversation(
-            title=title,
-            user_id=user_id
-        )
-        db.add(conversation)
+        conversation = await self._create_conversation_nocommit(db, user_id, title)
         await db.commit()
-        await db.refresh(conversation)
         return conversation
+
+    async def _create_conversation_nocommit(self, db: AsyncSession, user_id: uuid.UUID, title: str) -> Conversation:
+        """Insert a conversation in the current transaction; the caller commits."""
+        # RETURNING brings back server-generated columns (timestamps) in the same round trip
+        result = await db.execute(
+            insert(Conversation)
+            .values(title=title, user_id=user_id)
+            .returning(Conversation)
+        )
+        return result.scalar_one()
     
     async def update_conversation(self, db: AsyncSession, conversation_id: uuid.UUID, user_id: uuid.UUID, title: str):
         """Update a conversation"""
-        conversation = await self.get_conversation(db, conversation_id, user_id)
+        # One UPDATE ... RETURNING: ownership check, write and reload in a single round trip
+        result = await db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id, Conversation.user_id == user_id)
+            .values(title=title)
+            .returning(Conversation)
+            .execution_options(synchronize_session=False)
+        )
+        conversation = result.scalar_one_or_none()
         if not conversation:
             return None
-        
-        conversation.title = title
         await db.commit()
-        await db.refresh(conversation)
         return conversation
     
     async def delete_conversation(self, db: AsyncSession, conversation_id: uuid.UUID, user_id: uuid.UUID):
-        """Delete a conversation"""
-        conversation = await self.get_conversation(db, conversation_id, user_id)
-        if not conversation:
+        """
+        Delete a conversation and its messages with two bulk DELETEs in one transaction (nothing is
+        loaded: an ORM delete would load every message to cascade it)
+        """
+        owned = exists().where(Conversation.id == conversation_id, Conversation.user_id == user_id)
+        await db.execute(
+            delete(Message)
+            .where(Message.conversation_id == conversation_id, owned)
+            .execution_options(synchronize_session=False)
+        )
+        deleted_id = await db.scalar(
+            delete(Conversation)
+            .where(Conversation.id == conversation_id, Conversation.user_id == user_id)
+            .returning(Conversation.id)
+            .execution_options(synchronize_session=False)
+        )
+        if deleted_id is None:
+            await db.rollback()
             return False
-        
-        await db.delete(conversation)
         await db.commit()
+        self.history_cache.invalidate(conversation_id)
         return True
     
     async def add_message(self, db: AsyncSession, conversation_id: uuid.UUID, content: str, role: str):
         """Add a message to a conversation"""
-        message = Message(
-            content=content,
-            role=role,
-            conversation_id=conversation_id
-        )
-        db.add(message)
+        message = await self._add_message_nocommit(db, conversation_id, content, role)
         await db.commit()
-        await db.refresh(message)
         return message
-    
-    async def get_conversation_messages(self, db: AsyncSession, conversation_id: uuid.UUID):
-        """Get all messages of a conversation"""
+
+    async def _add_message_nocommit(self, db: AsyncSession, conversation_id: uuid.UUID, content: str, role: str) -> Message:
+        """Insert a message in the current transaction; the caller commits."""
+        # RETURNING brings back server-generated columns (timestamps) in the same round trip
         result = await db.execute(
-            select(Message)
-            .where(Message.conversation_id == conversation_id)
-            .order_by(Message.timestamp)
+            insert(Message)
+            .values(content=content, role=role, conversation_id=conversation_id)
+            .returning(Message)
         )
-        return result.scalars().all()
+        return result.scalar_one()
     
+    async def get_conversation_messages(self, db: AsyncSession, conversation_id: uuid.UUID, limit: Optional[int] = None):
+        """
+        Get the messages of a conversation in chronological order.
+        With `limit`, only the most recent `limit` messages are returned (e.g. for LLM context).
+        Messages are returned as read-only rows (id, content, role, timestamp): they are only
+        displayed, so mapping them into the session would be wasted work.
+        """
+        columns = select(Message.id, Message.content, Message.role, Message.timestamp).where(
+            Message.conversation_id == conversation_id
+        )
+        if limit is None:
+            result = await db.execute(columns.order_by(Message.timestamp))
+            return result.all()
+
+        result = await db.execute(columns.order_by(desc(Message.timestamp)).limit(limit))
+        messages = result.all()
+        messages.reverse()
+        return messages
+    
+    async def get_conversation_with_history(
+        self,
+        db: AsyncSession,
+        conversation_id: uuid.UUID,
+        user_id: uuid.UUID
+    ) -> Tuple[Optional[Conversation], List[Dict[str, str]], int]:
+        """
+        Get a conversation, its recent LLM history and its total number of messages.
+
+        The cached history is only used if it still matches the conversation's message count,
+        which is read with the conversation (an index-only count on ix_messages_conversation_id_timestamp),
+        so turns written through another worker are never missed. Otherwise the last
+        CHAT_CONTEXT_MESSAGES messages are outer-joined (LATERAL) to the conversation row in one round trip.
+        Returns (None, [], 0) if the conversation does not exist or belongs to another user.
+        """
+        message_count = (
+            select(func.count())
+            .select_from(Message)
+            .where(Message.conversation_id == Conversation.id)
+            .scalar_subquery()
+        )
+        if self.history_cache.has(conversation_id):
+            row = (await db.execute(
+                select(Conversation, message_count)
+                .where(Conversation.id == conversation_id, Conversation.user_id == user_id)
+            )).first()
+            if not row:
+                return None, [], 0
+            history = self.history_cache.get(conversation_id, row[1])
+            if history is not None:
+                return row[0], history, row[1]
+
+        recent = (
+            select(Message.role, Message.content, Message.timestamp)
+            .where(Message.conversation_id == Conversation.id)
+            .order_by(desc(Message.timestamp))
+            .limit(settings.CHAT_CONTEXT_MESSAGES)
+            .lateral("recent_messages")
+        )
+        result = await db.execute(
+            select(Conversation, message_count, recent.c.role, recent.c.content)
+            .outerjoin(recent, true())
+            .where(Conversation.id == conversation_id, Conversation.user_id == user_id)
+            .order_by(recent.c.timestamp)
+        )
+        rows = result.all()
+        if not rows:
+            return None, [], 0
+
+        history = [{"role": role, "content": content} for _, _, role, content in rows if role is not None]
+        self.history_cache.set(conversation_id, history, rows[0][1])
+        return rows[0][0], history, rows[0][1]
+
     async def generate_chat_response(
         self,
         db: AsyncSession,
@@ -122,48 +357,60 @@ class ChatService:
         Generate a chat response based on the message and the conversation history
         """
         try:
+            # The whole turn (new conversation, user message, assistant message) is written in
+            # one transaction and committed once at the end.
             # Get or create conversation
             conversation = None
-            is_new_conversation = False
+            history = []
+            message_count = 0
+            is_new_conversation = not conversation_id
             
             if conversation_id:
-                conversation = await self.get_conversation(db, conversation_id, user_id)
+                conversation, history, message_count = await self.get_conversation_with_history(db, conversation_id, user_id)
                 if not conversation:
                     raise ValueError(f"Conversation not found: {conversation_id}")
             else:
                 # Create new conversation with the first message as title
-                title = message[:30] + "..." if len(message) > 30 else message
-                conversation = await self.create_conversation(db, user_id, title)
-                is_new_conversation = True
+                conversation = await self._create_conversation_nocommit(db, user_id, _title_for(message))
                 conversation_id = conversation.id
             
-            # Save user message
-            user_message = await self.add_message(db, conversation_id, message, "user")
-            
-            # Get conversation history if it is an existing conversation
-            messages = []
-            if not is_new_conversation:
-                conversation_messages = await self.get_conversation_messages(db, conversation_id)
-                messages = [{"role": msg.role, "content": msg.content} for msg in conversation_messages]
-            else:
-                messages = [{"role": "user", "content": message}]
-            
+            # Conversation history plus the new user message
+            messages = (history + [{"role": "user", "content": message}])[-settings.CHAT_CONTEXT_MESSAGES:]
+            llm_messages, summary_due = _trim_history(
+                messages, message_count + 1, conversation.summary, conversation.summary_message_count
+            )
+            if summary_due:
+                self._schedule_summary(conversation_id)
+
             # Check if LLM client is available
             if not self.llm_client:
                 raise RuntimeError("ChatService is not configured with an LLM client.")
             
-            # Call the LLM client via the interface
-            assistant_message_content = await self.llm_client.generate_chat_completion(
-                messages=messages,
-                model=model or self.default_model,
-                temperature=temperature,
-                stream=False # Not streaming here
+            effective_model = model or self.default_model
+
+            # The user message write and the LLM call are independent: run them concurrently so the
+            # INSERT round trip is hidden behind the (much slower) completion. return_exceptions
+            # makes gather wait for both, so the session is idle again before any error propagates.
+            write_result, completion_result = await asyncio.gather(
+                self._add_message_nocommit(db, conversation_id, message, "user"),
+                self._complete_chat(llm_messages, effective_model, temperature),
+                return_exceptions=True
             )
+            for outcome in (write_result, completion_result):
+                if isinstance(outcome, BaseException):
+                    raise outcome
+            assistant_message_content = completion_result
             
-            # Save assistant response
-            assistant_message = await self.add_message(
+            # Save assistant response and commit the turn
+            assistant_message = await self._add_message_nocommit(
                 db, conversation_id, assistant_message_content, "assistant"
             )
+            await db.commit()
+            turn = ({"role": "user", "content": message}, {"role": "assistant", "content": assistant_message_content})
+            if is_new_conversation:
+                self.history_cache.set(conversation_id, list(turn), len(turn))
+            else:
+                self.history_cache.append(conversation_id, *turn)
             
             return {
                 "conversation_id": conversation_id,
@@ -171,9 +418,70 @@ class ChatService:
             }
             
         except Exception as e:
-            print(f"Error generating chat response: {str(e)}")
+            logger.exception("Error generating chat response")
             raise
 
+    async def _complete_chat(self, messages: List[Dict[str, str]], model: str, temperature: float) -> str:
+        """Non-streaming chat completion, served from the exact-match cache when near-deterministic."""
+        cache_key = None
+        if temperature <= CHAT_CACHE_MAX_TEMPERATURE:
+            cache_key = self._chat_cache_key(model, temperature, messages)
+            cached = await self._get_cached_chat_response(cache_key)
+            if cached is not None:
+                return cached
+
+        # Call the LLM client via the interface
+        content = await self._chat_completion(
+            messages=messages,
+            model=model,
+            temperature=temperature,
+            stream=False # Not streaming here
+        )
+        if cache_key:
+            self._run_in_background(self._cache_chat_response(cache_key, content))
+        return content
+
+    def _run_in_background(self, coro: Awaitable) -> None:
+        """Run a side effect (cache write, persistence) without making the caller wait for it."""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    def _schedule_summary(self, conversation_id: uuid.UUID):
+        """Ask a worker to refresh the running summary of a conversation (never fails the turn)."""
+        try:
+            from tasks.tasks import summarize_conversation_task
+            summarize_conversation_task.delay(str(conversation_id))
+        except Exception as e:
+            logger.warning(f"Could not schedule summary of conversation {conversation_id}: {e}")
+
+    @staticmethod
+    def _chat_cache_key(model: str, temperature: float, messages: List[Dict[str, str]]) -> str:
+        """Build the exact-match cache key for a chat completion request."""
+        digest = hashlib.sha256(orjson.dumps(messages, option=orjson.OPT_SORT_KEYS)).hexdigest()
+        return f"chat:{model}:{temperature}:{digest}"
+
+    async def _get_cached_chat_response(self, cache_key: str) -> Optional[str]:
+        """Return the cached assistant reply for the key, or None. Cache errors are never fatal."""
+        try:
+            cached = await redis_cache_call("get", cache_key)
+        except Exception as e:
+            logger.warning(f"Chat response cache lookup failed: {e}")
+            return None
+        if cached is None:
+            return None
+        logger.debug(f"Chat response cache hit for {cache_key}")
+        return cached.decode("utf-8")
+
+    async def _cache_chat_response(self, cache_key: str, content: str):
+        """Store an assistant reply in the exact-match cache."""
+        if not content:
+            return
+        try:
+            await redis_cache_call("setex", cache_key, settings.CHAT_RESPONSE_CACHE_TTL, content)
+        except Exception as e:
+            logger.warning(f"Failed to cache chat response: {e}")
+
     async def generate_stream_response(
         self,
         messages: list,
@@ -190,17 +498,19 @@ class ChatService:
 
             # Call the LLM client via the interface with stream=True
             # AWAIT the call to get the async generator
-            stream_generator = await self.llm_client.generate_chat_completion(
-                messages=messages,
-                model=model or self.default_model,
-                temperature=temperature,
-                stream=True
-            )
+            if model:
+                stream_generator = await self._chat_completion(
+                    messages=messages, model=model, temperature=temperature, stream=True
+                )
+            else:
+                stream_generator = await self._chat_completion(
+                    messages=messages, temperature=temperature, stream=True
+                )
             # Return the generator itself
             return stream_generator
             
         except Exception as e:
-            print(f"Error generating streaming response: {str(e)}")
+            logger.exception("Error generating streaming response")
             raise
 
     async def generate_rag_response(
@@ -220,52 +530,9 @@ class ChatService:
             if not self.llm_client:
                 raise RuntimeError("LLM client is not available in ChatService for RAG.")
 
-            # Search relevant document CHUNKS across all user documents
-            # search_similar_documents now returns List[Dict] where each Dict is a CHUNK
-            similar_chunks = await self.document_service.search_similar_documents(
-                db=db,
-                query_embedding=await self.document_service.generate_query_embedding(query), # Generate query embedding
-                user_id=user_id,
-                limit=5,  # Fetch top 5 chunks across all docs
-                min_similarity=0.2, # Filter at DB level
-                model="text-embedding-3-small" # Ensure model consistency
-                # document_id is None here, searching all docs
-            )
+            answer, sources = await self._coalesced_retrieve_and_answer(user_id, query)
 
-            # Format sources and build context directly from the returned chunks
-            sources = []
-            context_parts = []
-            processed_docs = set() # Keep track of documents included in sources
-
-            # No need to sort again by similarity here, DB already did it.
-            # Directly iterate over the chunks returned by the search service.
-            for chunk_info in similar_chunks: # Each item is a chunk dictionary
-                similarity = chunk_info["similarity"]
-                chunk_text = chunk_info.get("chunk_text")
-                document_meta = chunk_info.get("document", {}) # Get nested document metadata
-
-                # Add chunk to context if text exists and similarity is sufficient
-                # (DB already filtered by min_similarity, but keep check just in case)
-                if chunk_text and similarity > 0.2:
-                    # Limit context length if needed, e.g., by number of chunks or total chars
-                    if len(context_parts) < 3: # Example: Use top 3 chunks for context
-                       context_parts.append(f"[{document_meta.get('title', 'Unknown Title')} - Chunk {chunk_info.get('chunk_index', 'N/A')}]\n{chunk_text}")
-
-                # Add document to sources only once, using the highest similarity chunk for that doc
-                doc_id = document_meta.get("id")
-                if doc_id and doc_id not in processed_docs:
-                     sources.append({
-                         "document_name": document_meta.get("title", "No title"),
-                         "document_type": document_meta.get("type", "UNKNOWN"),
-                         "relevance": similarity, # Use similarity of the first chunk encountered for this doc
-                         "document_id": doc_id
-                     })
-                     processed_docs.add(doc_id)
-
-
-            if not context_parts:
-                # This happens if search_similar_documents returned 0 items
-                # or if all returned items had null/empty chunk_text
+            if answer is None:
                 logger.warning(f"RAG context is empty for query: '{query}' and user {user_id}.")
                 return {
                     "answer": "I did not find relevant information in the documents to answer your question.",
@@ -274,23 +541,9 @@ class ChatService:
                     "created_at": datetime.now()
                 }
 
-            context = "\n\n".join(context_parts)
-
-            # Generate response
-            # Use the LLM client interface
-            answer = await self.llm_client.generate_chat_completion(
-                model= self.default_model, # Use default model for RAG response generation for now
-                messages=[
-                    {"role": "system", "content": f"Answer the user's question based solely on the following context:\n\n{context}\n\nDo not add information that is not in the context. If the answer is not in the context, indicate that you cannot respond with the information provided."},
-                    {"role": "user", "content": query}
-                ],
-                temperature=0.3, # Lower temperature for more factual response
-                stream=False # Ensure stream is False for this method
-            )
-
             # If there is a conversation_id, save the exchange
             if conversation_id:
-                await self.save_rag_exchange(db, conversation_id, query, answer, sources)
+                await self.save_rag_exchange(db, user_id, conversation_id, query, answer, sources)
 
             return {
                 "answer": answer,
@@ -302,89 +555,363 @@ class ChatService:
             logger.error(f"Error in generate_rag_response: {str(e)}", exc_info=True) # Log full traceback
             raise # Re-raise exception for endpoint handler
 
+    async def _coalesced_retrieve_and_answer(
+        self,
+        user_id: uuid.UUID,
+        query: str
+    ) -> Tuple[Optional[str], List[Dict]]:
+        """
+        Run _retrieve_and_answer once per identical in-flight question.
+
+        The first request starts the work as a task of its own, with its own session, that no
+        request owns; identical requests (same user, since retrieval is scoped to the user's
+        documents) arriving meanwhile await the same task instead of calling the LLM. Every caller
+        awaits it through a shield, so a caller that disconnects never cancels the others' answer.
+        """
+        key = hashlib.sha256(f"{user_id}:{query}".encode("utf-8")).hexdigest()
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            inflight = asyncio.create_task(self._retrieve_and_answer_detached(user_id, query))
+            self._inflight[key] = inflight
+            inflight.add_done_callback(functools.partial(self._on_inflight_done, key))
+        else:
+            logger.debug(f"Joining in-flight RAG request for user {user_id}")
+        return await asyncio.shield(inflight)
+
+    def _on_inflight_done(self, key: str, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception() # Mark as retrieved: the callers (if any are left) get it from their await
+
+    async def _retrieve_and_answer_detached(self, user_id: uuid.UUID, query: str) -> Tuple[Optional[str], List[Dict]]:
+        """_retrieve_and_answer in a session of its own, so it does not depend on any request's session."""
+        async with get_async_session_context() as session:
+            return await self._retrieve_and_answer(session, user_id, query)
+
+    async def _retrieve_and_answer(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        query: str
+    ) -> Tuple[Optional[str], List[Dict]]:
+        """
+        Retrieve context for the query and generate the RAG answer.
+
+        Returns (answer, sources); answer is None when no relevant context was found.
+        """
+        # Start the embedding lookup right away (repeated question texts are served from the
+        # embedding cache); the prompt template below does not depend on it, so it is assembled
+        # while the request is in flight.
+        embedding_model = "text-embedding-3-small" # Ensure model consistency
+        # The user's document version keys the RAG caches; its Redis read overlaps the embedding
+        version_task = asyncio.create_task(get_documents_version(user_id))
+        query_embedding = self.embedding_cache.get_local(query, embedding_model)
+        embedding_task = None
+        if query_embedding is None:
+            embedding_task = asyncio.create_task(
+                self.embedding_cache.get_or_set(
+                    query,
+                    embedding_model,
+                    lambda: self.embedding_batcher.embed(query, embedding_model)
+                )
+            )
+        # Stable instructions first and the retrieved context last, so requests share the longest
+        # possible prompt prefix for the provider's prompt cache
+        system_prompt_template = (
+            "Answer the user's question based solely on the context below. "
+            "Do not add information that is not in the context. If the answer is not in the context, "
+            "indicate that you cannot respond with the information provided.\n\n"
+            "Context:\n\n{context}"
+        )
+        if embedding_task is not None:
+            # While the embedding request is in flight, check out the DB connection and open the
+            # transaction the vector search will run in, so that round trip is off the critical path
+            await self._warm_db_connection(db)
+            query_embedding = await embedding_task
+
+        # Both caches below are keyed on the user's document version, so their entries retire once
+        # a document is added, reprocessed or deleted; with the version unknown (Redis unavailable)
+        # they are bypassed.
+        docs_version = await version_task
+        cache_namespace = f"{user_id}:{docs_version}" if docs_version is not None else None
+
+        # Near-duplicate questions from the same user are answered from the semantic cache
+        if cache_namespace is not None:
+            cached = self.response_cache.get(query_embedding, cache_namespace)
+            if cached is not None:
+                return cached
+
+        # Close enough questions reuse the retrieved chunks and skip the vector search
+        similar_chunks = None
+        if cache_namespace is not None:
+            similar_chunks = await self.retrieval_cache.get(query_embedding, cache_namespace)
+        if similar_chunks is None:
+            # Search relevant document CHUNKS across all user documents
+            # fetch_similar returns List[Dict] where each Dict is a CHUNK
+            similar_chunks = await self.document_service.fetch_similar(
+                db=db,
+                query_embedding=query_embedding,
+                user_id=user_id,
+                limit=5,  # Fetch top 5 chunks across all docs
+                min_similarity=0.2, # Filter at DB level
+                model="text-embedding-3-small" # Ensure model consistency
+                # document_id is None here, searching all docs
+            )
+            # The Redis write of the cache entry is not needed to answer this question. Empty results
+            # are not cached: the user's documents may simply not be processed yet.
+            if similar_chunks and cache_namespace is not None:
+                self._run_in_background(self.retrieval_cache.put(query_embedding, cache_namespace, similar_chunks))
+
+        # Build context and sources directly from the returned chunks, in one vectorized pass over
+        # similarity, text presence and document id
+        n_chunks = len(similar_chunks)
+        sims = np.fromiter((c["similarity"] for c in similar_chunks), dtype=np.float32, count=n_chunks)
+        has_text = np.fromiter((bool(c.get("chunk_text")) for c in similar_chunks), dtype=bool, count=n_chunks)
+
+        # Chunks come back from the DB already ranked by distance, so no sorting is needed here:
+        # a mask for the similarity threshold (DB already filtered, but keep check just in case)
+        # and empty texts, then the first eligible chunks form the context.
+        eligible = np.flatnonzero((sims > 0.2) & has_text)
+        # Example: Use top 3 chunks for context. They are laid out in canonical
+        # document_id:chunk_index order (not rank order) so the same chunk set always yields the
+        # same prompt; chunk_text must therefore not contain per-request data such as timestamps.
+        context_chunks = sorted((similar_chunks[i] for i in eligible[:3]), key=_chunk_canonical_key)
+        if not context_chunks:
+            # This happens if fetch_similar returned 0 items
+            # or if all returned items had null/empty chunk_text
+            return None, []
+
+        context = "\n\n".join(
+            _CHUNK_TMPL.format(
+                title=chunk.get("document", {}).get("title", "Unknown Title"),
+                chunk_index=chunk.get("chunk_index", "N/A"),
+                chunk_text=chunk["chunk_text"],
+            )
+            for chunk in context_chunks
+        )
+        prompt_cache_key = hashlib.blake2b(
+            "|".join(f"{doc_id}:{chunk_index}" for doc_id, chunk_index in map(_chunk_canonical_key, context_chunks)).encode("utf-8"),
+            digest_size=16
+        ).hexdigest()
+
+        # One source per document: np.unique gives the first (best ranked) chunk of each document,
+        # re-sorted into rank order. Chunks without a document id are skipped.
+        doc_ids = np.array([str(c.get("document", {}).get("id") or "") for c in similar_chunks])
+        _, first_idx = np.unique(doc_ids, return_index=True)
+        first_idx.sort()
+        sources = [
+            {
+                "document_name": similar_chunks[i].get("document", {}).get("title", "No title"),
+                "document_type": similar_chunks[i].get("document", {}).get("type", "UNKNOWN"),
+                "relevance": similar_chunks[i]["similarity"], # Similarity of the document's best chunk
+                "document_id": similar_chunks[i]["document"]["id"]
+            }
+            for i in first_idx
+            if doc_ids[i]
+        ]
+
+        # Generate response
+        # Use the LLM client interface
+        answer = await self._chat_completion( # Default model for RAG response generation for now
+            messages=[
+                {"role": "system", "content": system_prompt_template.format(context=context)},
+                {"role": "user", "content": query}
+            ],
+            temperature=0.3, # Lower temperature for more factual response
+            stream=False, # Ensure stream is False for this method
+            prompt_cache_key=prompt_cache_key
+        )
+
+        # context_chunks is non-empty here (empty contexts returned above), so only answers grounded
+        # in the user's documents are cached
+        if answer and cache_namespace is not None:
+            self.response_cache.put(query_embedding, cache_namespace, (answer, sources))
+        return answer, sources
+
+    @staticmethod
+    async def _warm_db_connection(db: AsyncSession):
+        """Make the session acquire its connection now. Failures are left to the real query."""
+        try:
+            await db.execute(text("SELECT 1"))
+        except Exception as e:
+            logger.debug(f"DB warmup query failed: {e}")
+
     async def save_rag_exchange(
         self,
         db: AsyncSession,
+        user_id: uuid.UUID,
         conversation_id: uuid.UUID,
         query: str,
         answer: str,
         sources: List[Dict]
-    ):
+    ) -> bool:
         """
         Save a RAG exchange in the conversation
+
+        Both messages are written with a single INSERT ... SELECT that only yields rows when the
+        conversation exists and belongs to the user, so ownership is validated in the same round trip.
+        Returns False if nothing was saved.
         """
-        # User message
-        user_message = Message(
-            conversation_id=conversation_id,
-            content=query,
-            role="user"
+        owned = (
+            select(Conversation.id)
+            .where(Conversation.id == conversation_id, Conversation.user_id == user_id)
+            .cte("owned_conversation")
         )
-        db.add(user_message)
-        
-        # System message with sources
-        system_message = Message(
-            conversation_id=conversation_id,
-            content=answer,
-            role="assistant",
-            metadata={"sources": sources}
+        user_timestamp = datetime.utcnow()
+        assistant_timestamp = datetime.utcnow()
+        rows = union_all(
+            # User message
+            select(
+                literal(uuid.uuid4(), Message.id.type),
+                owned.c.id,
+                literal(query, Message.content.type),
+                literal("user", Message.role.type),
+                literal(user_timestamp, Message.timestamp.type),
+            ),
+            # Assistant message (sources are returned to the caller, messages have no metadata column)
+            select(
+                literal(uuid.uuid4(), Message.id.type),
+                owned.c.id,
+                literal(answer, Message.content.type),
+                literal("assistant", Message.role.type),
+                literal(assistant_timestamp, Message.timestamp.type),
+            ),
         )
-        db.add(system_message)
-        
+        stmt = (
+            insert(Message.__table__)
+            .from_select(["id", "conversation_id", "content", "role", "timestamp"], rows)
+            .returning(Message.__table__.c.id)
+        )
+        result = await db.execute(stmt)
+        saved = len(result.all())
         await db.commit()
+        if saved:
+            self.history_cache.append(
+                conversation_id,
+                {"role": "user", "content": query},
+                {"role": "assistant", "content": answer}
+            )
+
+        if not saved:
+            logger.warning(f"RAG exchange not saved: conversation {conversation_id} not found for user {user_id}")
+        return saved > 0
 
-    async def stream_chat_response_full(self, db: AsyncSession, user: User, chat_request: Any):
-        """Handles the full streaming chat logic including conversation and message management."""
+    async def stream_chat_response_full(
+        self,
+        db: AsyncSession,
+        user: User,
+        chat_request: Any,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+    ):
+        """
+        Handles the full streaming chat logic including conversation and message management.
+
+        `is_disconnected` (e.g. the request's is_disconnected) is polled while streaming; once the
+        client has gone the upstream LLM stream is closed and the partial reply is saved.
+        """
 
         conversation_id = chat_request.conversation_id
+        # Either the 'message' or the 'content' field (validated non-empty by the schema)
+        user_message = chat_request.get_message()
         conversation = None
+        history = []
+        message_count = 0
+        is_new_conversation = not conversation_id
         
-        # 1. Get or Create Conversation
+        # 1. Get or Create Conversation, with its recent history in the same round trip
         if conversation_id:
-            conversation = await self.get_conversation(db, conversation_id, user.id)
+            conversation, history, message_count = await self.get_conversation_with_history(db, conversation_id, user.id)
             if not conversation:
                  # Raise an error the endpoint can catch
                  raise ValueError(f"Conversation {conversation_id} not found or access denied.")
         else:
-            title = chat_request.content[:30] + "..." if len(chat_request.content) > 30 else chat_request.content
-            conversation = await self.create_conversation(db, user.id, title)
+            conversation = await self._create_conversation_nocommit(db, user.id, _title_for(user_message))
             conversation_id = conversation.id
             logger.info(f"Created new conversation {conversation_id} for stream.")
 
-        # 2. Save User Message
-        await self.add_message(db, conversation_id, chat_request.content, "user")
-
-        # 3. Get Message History
-        db_messages = await self.get_conversation_messages(db, conversation_id)
+        # 2. Message History plus the new user message
         # TODO: Add system prompt if needed
-        history = [{"role": msg.role, "content": msg.content} for msg in db_messages]
+        history = (history + [{"role": "user", "content": user_message}])[-settings.CHAT_CONTEXT_MESSAGES:]
+        llm_messages, summary_due = _trim_history(
+            history, message_count + 1, conversation.summary, conversation.summary_message_count
+        )
+        if summary_due:
+            self._schedule_summary(conversation_id)
+
+        # 3. Save User Message (committed once the AI stream has started)
+        await self._add_message_nocommit(db, conversation_id, user_message, "user")
         
         # 4. Generate stream from AI
         try:
             stream = await self.generate_stream_response(
-                messages=history,
+                messages=llm_messages,
                 model=chat_request.model,
                 temperature=chat_request.temperature
             )
         except Exception as ai_error:
              logger.error(f"Error calling OpenAI stream API: {ai_error}")
-             # Yield an error message chunk or raise exception
-             yield json.dumps({"error": "Failed to get response from AI model."})
+             await db.rollback() # Nothing of this turn is persisted
+             # Yield an error event or raise exception
+             yield sse_event({"error": "Failed to get response from AI model."})
+             yield SSE_DONE
              return # Stop generation
 
+        # The stream is open: commit the conversation and user message
+        await db.commit()
+        user_turn = {"role": "user", "content": user_message}
+        if is_new_conversation:
+            self.history_cache.set(conversation_id, [user_turn], 1)
+        else:
+            self.history_cache.append(conversation_id, user_turn)
+
         # 5. Stream response chunks and collect full response
-        full_assistant_response = ""
-        async for content_chunk in stream:
-            if content_chunk:
-                full_assistant_response += content_chunk
-                # Yield chunk in desired format (e.g., JSON string)
-                yield json.dumps({"content": content_chunk, "conversation_id": str(conversation_id)}) + "\n"
-        
-        # Add a final newline or marker if needed by client
-        # yield "\n"
+        # Collect parts and join once at the end (guaranteed linear, unlike repeated +=)
+        response_parts: List[str] = []
+        # Each token is sent as an SSE event. The conversation_id part of the payload is constant:
+        # serialize it once and only encode the token itself per chunk
+        frame_prefix = b'data: {"conversation_id":' + orjson.dumps(str(conversation_id)) + b',"content":'
+        chunks = _iter_with_keepalive(stream, SSE_KEEPALIVE_SECONDS)
+        disconnected = False
+        try:
+            chunk_count = 0
+            async for content_chunk in chunks:
+                if content_chunk is None:
+                    # Comment line so proxies and clients do not drop an idle connection
+                    yield SSE_KEEPALIVE
+                    continue
+                chunk_count += 1
+                if content_chunk:
+                    response_parts.append(content_chunk)
+                    yield frame_prefix + orjson.dumps(content_chunk) + b"}\n\n"
+                if is_disconnected and chunk_count % DISCONNECT_CHECK_INTERVAL == 0 and await is_disconnected():
+                    # Nobody is reading: stop paying for the remaining tokens
+                    logger.info(f"Client disconnected, stopping stream for conversation {conversation_id}")
+                    disconnected = True
+                    break
+            if not disconnected:
+                yield SSE_DONE
+        finally:
+            # Stop the upstream LLM stream on disconnect or cancellation, and keep what was generated
+            await chunks.aclose()
+            if hasattr(stream, "aclose"):
+                await stream.aclose()
+            # 6. Save Full Assistant Message in the background, so the response closes right after the last token
+            full_assistant_response = "".join(response_parts)
+            if full_assistant_response:
+                 self._run_in_background(self._persist_assistant_message(conversation_id, full_assistant_response))
+            else:
+                 logger.warning(f"No content received from assistant stream for conversation {conversation_id}")
 
-        # 6. Save Full Assistant Message (after stream is complete)
-        if full_assistant_response:
-             await self.add_message(db, conversation_id, full_assistant_response, "assistant")
-             logger.info(f"Saved full assistant response to conversation {conversation_id}")
-        else:
-             logger.warning(f"No content received from assistant stream for conversation {conversation_id}")
+    async def _persist_assistant_message(self, conversation_id: uuid.UUID, content: str):
+        """
+        Save a streamed assistant reply with its own session (the request-scoped one is closed by
+        the time this runs). Errors are logged, never raised.
+        """
+        try:
+            async with get_async_session_context() as session:
+                await self._add_message_nocommit(session, conversation_id, content, "assistant")
+            self.history_cache.append(conversation_id, {"role": "assistant", "content": content})
+            logger.info(f"Saved full assistant response to conversation {conversation_id}")
+        except Exception:
+            self.history_cache.invalidate(conversation_id)
+            logger.exception(f"Failed to save assistant response for conversation {conversation_id}")
@@ -1,9 +1,10 @@
 from typing import Dict, Any, Optional, List
-from openai import AsyncOpenAI
-import httpx
+import logging
 from core.config import settings
 from core.llm_interface import LLMClientInterface, LLMMessage
 
+logger = logging.getLogger(__name__)
+
 class CompletionService:
     """Service to generate text completions with LLMs"""
     
@@ -32,10 +33,12 @@ class CompletionService:
         """
         try:
             messages: List[LLMMessage] = [{"role": "user", "content": prompt}]
+            effective_model = model or self.default_model
+            logger.debug("Generating completion with model %s", effective_model)
             
             completion_text = await self.llm_client.generate_chat_completion(
                 messages=messages,
-                model=model or self.default_model,
+                model=effective_model,
                 temperature=temperature,
                 max_tokens=max_tokens,
                 stream=False
@@ -44,5 +47,5 @@ class CompletionService:
             return completion_text
             
         except Exception as e:
-            print(f"Error generating completion: {str(e)}")
+            logger.exception("Error generating completion")
             raise
@@ -0,0 +1,66 @@
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Message dicts as sent to the LLM: {"role": ..., "content": ...}
+HistoryMessage = Dict[str, str]
+
+
+class ConversationHistoryCache:
+    """
+    In-process TTL LRU cache of the recent LLM history of conversations.
+
+    Keeps the last `window` messages of each conversation so a new turn can be built in memory
+    instead of re-reading the history from the database. Callers only update an entry after the
+    corresponding messages are committed. The cache is per worker, so each entry records the
+    total number of messages of the conversation it reflects: callers pass the current count
+    from the database to get(), and an entry that missed messages written by another worker (or
+    process) is dropped instead of being served.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: int = 600, window: int = 40):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.window = window
+        self._entries: "OrderedDict[uuid.UUID, Tuple[float, int, List[HistoryMessage]]]" = OrderedDict()
+
+    def has(self, conversation_id: uuid.UUID) -> bool:
+        """Whether an unexpired entry exists (it may still be stale, see get)."""
+        entry = self._entries.get(conversation_id)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def get(self, conversation_id: uuid.UUID, message_count: int) -> Optional[List[HistoryMessage]]:
+        """
+        Return a copy of the cached history, or None on a miss, an expired entry or an entry
+        whose message count differs from `message_count` (the conversation's count in the database).
+        """
+        entry = self._entries.get(conversation_id)
+        if entry is None:
+            return None
+        expires_at, cached_count, messages = entry
+        if expires_at <= time.monotonic() or cached_count != message_count:
+            del self._entries[conversation_id]
+            return None
+        self._entries.move_to_end(conversation_id)
+        return list(messages)
+
+    def set(self, conversation_id: uuid.UUID, messages: List[HistoryMessage], message_count: int) -> None:
+        """Replace the cached history of a conversation that has `message_count` messages in total."""
+        self._entries[conversation_id] = (
+            time.monotonic() + self.ttl_seconds, message_count, list(messages[-self.window:])
+        )
+        self._entries.move_to_end(conversation_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def append(self, conversation_id: uuid.UUID, *messages: HistoryMessage) -> None:
+        """Append committed messages to a cached history; no-op if the conversation is not cached."""
+        entry = self._entries.get(conversation_id)
+        if entry is None or entry[0] <= time.monotonic():
+            return
+        _, cached_count, cached = entry
+        self.set(conversation_id, cached + list(messages), cached_count + len(messages))
+
+    def invalidate(self, conversation_id: uuid.UUID) -> None:
+        self._entries.pop(conversation_id, None)
@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (texts, model) -> one embedding per text, e.g. LLMClientInterface.generate_embeddings
+EmbedFn = Callable[[List[str], str], Awaitable[List[List[float]]]]
+
+
+class BatchingEmbedder:
+    """
+    Coalesces concurrent single-text embedding requests into batched API calls.
+
+    Texts requested within `max_wait_seconds` of the first pending one (or until `max_batch_size`
+    texts are waiting) are sent to `embed_fn` in a single call per model; each caller awaits its
+    own future. The call runs in a flush task that no caller owns, so a cancelled caller only
+    drops its own future. Identical texts in a batch share one input. A failed call fails every
+    request of that batch.
+    """
+
+    def __init__(self, embed_fn: EmbedFn, max_batch_size: int = 64, max_wait_seconds: float = 0.02):
+        self.embed_fn = embed_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self._pending: Dict[str, List[Tuple[str, asyncio.Future]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._flush_tasks: set = set()
+
+    async def embed(self, text: str, model: str) -> List[float]:
+        """Return the embedding of `text`, computed as part of the next batch for `model`."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.setdefault(model, [])
+        batch.append((text, future))
+
+        if len(batch) >= self.max_batch_size:
+            self._schedule_flush(model)
+        elif model not in self._timers:
+            self._timers[model] = loop.call_later(self.max_wait_seconds, self._schedule_flush, model)
+        return await future
+
+    def _schedule_flush(self, model: str) -> None:
+        timer = self._timers.pop(model, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(model, None)
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._flush(model, batch))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush(self, model: str, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            embeddings = await self.embed_fn(texts, model)
+            if len(embeddings) != len(texts):
+                raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+        except asyncio.CancelledError:
+            # The flush task belongs to no caller, so this only happens on shutdown; do not leave
+            # the callers waiting forever
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            logger.error(f"Batched embedding call for {len(texts)} texts failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        logger.debug(f"Embedded {len(batch)} requests with {len(texts)} inputs in one call (model={model})")
+        by_text = dict(zip(texts, embeddings))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
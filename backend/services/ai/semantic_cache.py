@@ -0,0 +1,282 @@
+import asyncio
+import base64
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, List, Optional, Sequence
+
+import numpy as np
+import orjson
+
+from core.redis_client import redis_cache_call, redis_cache_pipeline
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticResponseCache:
+    """
+    In-process cache of responses keyed by query embedding similarity.
+
+    Embeddings are L2-normalized and stored in a preallocated float32 (max_size, dim) matrix; a
+    lookup is a single BLAS matrix-vector product over the filled rows. The matrix is kept float32
+    on purpose: a product of smaller codes (int8, float16) with the float32 query is upcast by
+    numpy into a temporary float32 copy of the whole matrix on every lookup. Entries are scoped
+    by a namespace (e.g. the user id) and expire after `ttl_seconds`. Once the cache is full the
+    oldest slot is overwritten.
+    """
+
+    def __init__(self, max_size: int = 1024, dim: int = 1536, threshold: float = 0.95, ttl_seconds: int = 3600):
+        self.max_size = max_size
+        self.dim = dim
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+
+        self._matrix = np.empty((max_size, dim), dtype=np.float32)
+        self._namespaces = np.empty(max_size, dtype=object)
+        self._expires_at = np.zeros(max_size, dtype=np.float64)
+        self._values: list = [None] * max_size
+        self.n_entries = 0
+        self._next_slot = 0 # Slot to overwrite once the cache is full
+
+    def _normalize(self, embedding: Sequence[float]) -> Optional[np.ndarray]:
+        q = np.asarray(embedding, dtype=np.float32)
+        if q.shape != (self.dim,):
+            logger.debug(f"Skipping semantic cache for embedding of shape {q.shape}, expected ({self.dim},)")
+            return None
+        norm = np.linalg.norm(q)
+        if not norm:
+            return None
+        return q / norm
+
+    def get(self, embedding: Sequence[float], namespace: str) -> Optional[Any]:
+        """Return the cached value of the closest entry in `namespace` if it is within the threshold."""
+        if not self.n_entries:
+            return None
+        q = self._normalize(embedding)
+        if q is None:
+            return None
+
+        n = self.n_entries
+        sims = self._matrix[:n] @ q
+        valid = (self._namespaces[:n] == namespace) & (self._expires_at[:n] > time.monotonic())
+        if not valid.any():
+            return None
+        sims = np.where(valid, sims, -np.inf)
+        idx = int(np.argmax(sims))
+        if sims[idx] >= self.threshold:
+            logger.debug(f"Semantic cache hit (similarity {sims[idx]:.4f}) for namespace {namespace}")
+            return self._values[idx]
+        return None
+
+    def put(self, embedding: Sequence[float], namespace: str, value: Any) -> None:
+        """Store `value` under the given query embedding."""
+        q = self._normalize(embedding)
+        if q is None:
+            return
+
+        if self.n_entries < self.max_size:
+            slot = self.n_entries
+            self.n_entries += 1
+        else:
+            slot = self._next_slot
+            self._next_slot = (slot + 1) % self.max_size
+
+        self._matrix[slot] = q
+        self._namespaces[slot] = namespace
+        self._expires_at[slot] = time.monotonic() + self.ttl_seconds
+        self._values[slot] = value
+
+
+class ProximityCache:
+    """
+    LRU cache of retrieval results (e.g. RAG chunks) keyed by query embedding proximity.
+
+    A lookup hits when the cosine distance between the query and a cached embedding of the
+    same namespace is <= `tau`. Normalized embeddings live in a preallocated (capacity, dim)
+    float32 matrix whose slots are recycled in LRU order. Entries are mirrored to Redis under
+    a hash of the embedding rounded to 3 decimals, so other workers can reuse results for the
+    same query.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1024,
+        dim: int = 1536,
+        tau: float = 0.05,
+        ttl_seconds: int = 300,
+        redis_prefix: str = "rag:chunks",
+    ):
+        self.capacity = capacity
+        self.dim = dim
+        self.tau = tau
+        self.ttl_seconds = ttl_seconds
+        self.redis_prefix = redis_prefix
+
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self._namespaces = np.empty(capacity, dtype=object)
+        self._expires_at = np.zeros(capacity, dtype=np.float64)
+        self._values: list = [None] * capacity
+        self._lru: "OrderedDict[str, int]" = OrderedDict() # entry key -> slot, least recently used first
+        self._slot_keys: list = [None] * capacity
+
+    def _normalize(self, embedding: Sequence[float]) -> Optional[np.ndarray]:
+        q = np.asarray(embedding, dtype=np.float32)
+        if q.shape != (self.dim,):
+            return None
+        norm = np.linalg.norm(q)
+        if not norm:
+            return None
+        return q / norm
+
+    def _entry_key(self, q: np.ndarray, namespace: str) -> str:
+        bucket = hashlib.sha256(np.round(q, 3).tobytes()).hexdigest()
+        return f"{self.redis_prefix}:{namespace}:{bucket}"
+
+    async def get(self, embedding: Sequence[float], namespace: str) -> Optional[Any]:
+        """Return the cached value for the nearest embedding within `tau`, locally or from Redis."""
+        q = self._normalize(embedding)
+        if q is None:
+            return None
+
+        if self._lru:
+            sims = self._matrix @ q
+            valid = (self._namespaces == namespace) & (self._expires_at > time.monotonic())
+            if valid.any():
+                sims = np.where(valid, sims, -np.inf)
+                slot = int(np.argmax(sims))
+                if sims[slot] >= 1.0 - self.tau:
+                    self._lru.move_to_end(self._slot_keys[slot])
+                    return self._values[slot]
+
+        # Secondary: another worker may have cached the same query
+        key = self._entry_key(q, namespace)
+        try:
+            cached = await redis_cache_call("get", key)
+        except Exception as e:
+            logger.warning(f"Proximity cache Redis lookup failed: {e}")
+            return None
+        if cached is None:
+            return None
+        value = orjson.loads(cached)
+        self._store(q, namespace, key, value)
+        return value
+
+    async def put(self, embedding: Sequence[float], namespace: str, value: Any) -> None:
+        """Cache `value` for the embedding locally and in Redis."""
+        q = self._normalize(embedding)
+        if q is None:
+            return
+        key = self._entry_key(q, namespace)
+        self._store(q, namespace, key, value)
+        try:
+            await redis_cache_call("setex", key, self.ttl_seconds, orjson.dumps(value))
+        except Exception as e:
+            logger.warning(f"Failed to write proximity cache entry to Redis: {e}")
+
+    def _store(self, q: np.ndarray, namespace: str, key: str, value: Any) -> None:
+        slot = self._lru.get(key)
+        if slot is None:
+            if len(self._lru) >= self.capacity:
+                # Evict the least recently used entry and reuse its slot
+                _, slot = self._lru.popitem(last=False)
+            else:
+                slot = len(self._lru)
+            self._lru[key] = slot
+        self._lru.move_to_end(key)
+
+        self._matrix[slot] = q
+        self._namespaces[slot] = namespace
+        self._expires_at[slot] = time.monotonic() + self.ttl_seconds
+        self._values[slot] = value
+        self._slot_keys[slot] = key
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache of text embeddings keyed by SHA-256 of (model, text).
+
+    A small in-process LRU map sits in front of Redis, where vectors are stored as base64 float16
+    (half the float32 size; the precision loss is irrelevant for cosine retrieval) for
+    `ttl_seconds`, so repeated texts skip the embedding API across workers and restarts.
+    Redis errors are never fatal: the embedding is then simply computed. The Redis write of a
+    freshly computed embedding runs in the background, so the caller gets the vector without
+    waiting for that extra round trip; writes queued together (e.g. the misses answered by one
+    batched embedding request) are sent in a single pipelined round trip.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: int = 7 * 24 * 3600, redis_prefix: str = "emb"):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.redis_prefix = redis_prefix
+        self._local: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._pending_writes: set = set() # Keeps background Redis writes referenced until done
+        self._write_buffer: "OrderedDict[str, List[float]]" = OrderedDict() # Queued for the next flush
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def _key(self, text: str, model: str) -> str:
+        return f"{self.redis_prefix}:{model}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    def _remember(self, key: str, embedding: List[float]) -> None:
+        self._local[key] = embedding
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_size:
+            self._local.popitem(last=False)
+
+    def get_local(self, text: str, model: str) -> Optional[List[float]]:
+        """Return the embedding from the in-process tier only (no I/O), or None."""
+        key = self._key(text, model)
+        embedding = self._local.get(key)
+        if embedding is not None:
+            self._local.move_to_end(key)
+        return embedding
+
+    async def get_or_set(
+        self,
+        text: str,
+        model: str,
+        compute_fn: Callable[[], Awaitable[List[float]]]
+    ) -> List[float]:
+        """Return the cached embedding of `text`, computing and caching it with `compute_fn` on a miss."""
+        key = self._key(text, model)
+        embedding = self._local.get(key)
+        if embedding is not None:
+            self._local.move_to_end(key)
+            return embedding
+
+        try:
+            cached = await redis_cache_call("get", key)
+        except Exception as e:
+            logger.warning(f"Embedding cache Redis lookup failed: {e}")
+            cached = None
+        if cached is not None:
+            embedding = np.frombuffer(base64.b64decode(cached), dtype=np.float16).astype(np.float32).tolist()
+            self._remember(key, embedding)
+            return embedding
+
+        embedding = await compute_fn()
+        self._remember(key, embedding)
+        self._queue_write(key, embedding)
+        return embedding
+
+    def _queue_write(self, key: str, embedding: List[float]) -> None:
+        self._write_buffer[key] = embedding
+        if self._flush_task is None:
+            task = asyncio.create_task(self._flush_writes())
+            self._flush_task = task
+            self._pending_writes.add(task)
+            task.add_done_callback(self._pending_writes.discard)
+
+    async def _flush_writes(self) -> None:
+        # Yield once so the other misses resolved in the same loop iteration queue their writes too
+        await asyncio.sleep(0)
+        buffer, self._write_buffer = self._write_buffer, OrderedDict()
+        self._flush_task = None
+        try:
+            commands = [
+                ("setex", (key, self.ttl_seconds, base64.b64encode(np.asarray(embedding, dtype=np.float16).tobytes())))
+                for key, embedding in buffer.items()
+            ]
+            await redis_cache_pipeline(commands)
+        except Exception as e:
+            logger.warning(f"Failed to write {len(buffer)} embedding cache entries to Redis: {e}")
@@ -5,9 +5,11 @@
 REDIS_HOST=${REDIS_HOST:-localhost}
 REDIS_PORT=${REDIS_PORT:-6379}
 REDIS_DB=${REDIS_DB:-0}
-CELERY_CONCURRENCY=${CELERY_CONCURRENCY:-4}
+CELERY_CONCURRENCY=${CELERY_CONCURRENCY:-${CELERY_WORKER_CONCURRENCY:-8}}
 CELERY_POOL=${CELERY_POOL:-prefork}
 CELERY_LOG_LEVEL=${CELERY_LOG_LEVEL:-info}
+# Colas a consumir: "celery" (pipelines) y "embeddings"; un worker dedicado puede usar solo una
+CELERY_QUEUES=${CELERY_QUEUES:-celery,embeddings}
 
 # Verificar si Redis está disponible
 echo "Verificando conexión a Redis en $REDIS_HOST:$REDIS_PORT..."
@@ -40,6 +42,8 @@ celery -A backend.tasks.worker worker \
     --loglevel=$CELERY_LOG_LEVEL \
     --concurrency=$CELERY_CONCURRENCY \
     --pool=$CELERY_POOL \
+    --queues=$CELERY_QUEUES \
+    -O fair \
     "$@"
 
 echo "Worker stopped."
\ No newline at end of file
@@ -1,6 +1,23 @@
 from .worker import celery_app
 
-# Import task definitions to ensure proper registration
-from .tasks import execute_pipeline, monitor_batch_process, test_task
+# Task definitions live in tasks.tasks, which the worker registers through
+# celery_app.autodiscover_tasks(['tasks']). They are only imported here on first access, so
+# importing celery_app (e.g. from the health checks) does not pull in the models, the pipeline
+# executor and the LLM clients.
+_TASK_NAMES = (
+    'execute_pipeline',
+    'execute_pipeline_batch',
+    'monitor_batch_process',
+    'test_task',
+    'process_document_embeddings_task',
+    'summarize_conversation_task',
+    'prune_embedding_cache_task',
+)
 
-__all__ = ['celery_app', 'execute_pipeline', 'monitor_batch_process', 'test_task']
+def __getattr__(name):
+    if name in _TASK_NAMES:
+        from . import tasks as task_definitions
+        return getattr(task_definitions, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+__all__ = ['celery_app', *_TASK_NAMES]
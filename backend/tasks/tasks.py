@@ -4,18 +4,27 @@ Definición de tareas de Celery para procesamiento asíncrono
 import time
 import logging
 import asyncio
-import json
 import uuid
 from .worker import celery_app
 from database.models.pipeline import Pipeline, PipelineExecution
-from database.models.document import Document
+from database.models.document import Document, ProcessingStatus
+from database.models.conversation import Conversation, Message
 from modules.pipeline.executor import PipelineExecutor, create_processing_result
+from modules.pipeline.processors import TextExtractionProcessor, get_processor
+from modules.document.embedding_cache import prune_embeddings
+from modules.document.versions import bump_documents_version
+from core.dependencies import get_document_service, get_llm_client
+from sqlalchemy import func, literal, select, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.exc import StatementError
 from sqlalchemy.ext.asyncio import AsyncSession
-from database.session import get_async_session_context
+from database.session import get_async_session_context, encoded_json
 from core.config import settings
+from core.redis_client import redis_cache_pipeline
 import os
 import traceback
 from datetime import datetime
+from functools import lru_cache
 
 # Settings logging
 logger = logging.getLogger('tasks.pipeline')
@@ -53,6 +62,59 @@ def execute_pipeline(pipeline_id: str, document_id: str, execution_id: str | Non
     Returns:
         dict: Result of the execution, including final status and elapsed time.
     """
+    loop = asyncio.get_event_loop() # Get the current event loop for this worker process
+    return loop.run_until_complete(_run_pipeline_execution(pipeline_id, document_id, execution_id))
+
+@celery_app.task(name="execute_pipeline_batch")
+def execute_pipeline_batch(pipeline_id: str, executions: list, batch_id: str):
+    """
+    Execute a pipeline for a chunk of a batch's documents inside a single task.
+    
+    The executions run concurrently on this worker's event loop (they mostly wait on the LLM and
+    embedding APIs), so a chunk costs one broker message and one stored result instead of one
+    per document. At most PIPELINE_BATCH_CONCURRENCY of them run at once, since each holds a
+    database connection for its whole run.
+    
+    Args:
+        pipeline_id (str): ID of the pipeline to execute
+        executions (list): (document_id, execution_id) pairs of this chunk
+        batch_id (str): ID of the batch process
+    
+    Returns:
+        list: Result of each execution, as returned by execute_pipeline
+    """
+    logger.info(f"Batch {batch_id}: running {len(executions)} executions of pipeline {pipeline_id} in one task")
+    # Every execution of the chunk shares the pipeline: parse its ID once
+    pipeline_uuid = uuid.UUID(pipeline_id)
+    loop = asyncio.get_event_loop()
+    return loop.run_until_complete(_run_pipeline_executions(pipeline_id, executions, pipeline_uuid))
+
+async def _run_pipeline_executions(pipeline_id: str, executions: list, pipeline_uuid: uuid.UUID):
+    """Run a chunk's executions concurrently, PIPELINE_BATCH_CONCURRENCY at a time, in order."""
+    semaphore = asyncio.Semaphore(settings.PIPELINE_BATCH_CONCURRENCY)
+
+    async def run_bounded(document_id, execution_id):
+        async with semaphore:
+            return await _run_pipeline_execution(pipeline_id, document_id, execution_id, pipeline_uuid=pipeline_uuid)
+
+    return await asyncio.gather(*(
+        run_bounded(document_id, execution_id) for document_id, execution_id in executions
+    ))
+
+async def _run_pipeline_execution(
+    pipeline_id: str,
+    document_id: str,
+    execution_id: str | None,
+    pipeline_uuid: uuid.UUID | None = None
+):
+    """
+    Run one pipeline execution and build its (small) status dict.
+    
+    The IDs are parsed to UUIDs once here (`pipeline_uuid` may be passed in already parsed) and
+    handed down; the string forms are kept for the status dict and logs.
+    Unexpected errors are caught here and the execution is marked FAILED, so one failing execution
+    never aborts the other executions of a batch task.
+    """
     if not execution_id:
         logger.error("FATAL: execute_pipeline task called without execution_id. Cannot track status.")
         # Decide how to handle this - fail task, return error, etc.
@@ -67,12 +129,12 @@ def execute_pipeline(pipeline_id: str, document_id: str, execution_id: str | Non
         
     logger.info(f"Starting pipeline task {execution_id} for pipeline {pipeline_id}, doc {document_id}")
     start_time = time.time()
-    loop = asyncio.get_event_loop() # Get the current event loop for this worker process
+    exec_uuid = None
     
     try:
-        # Execute the async logic using loop.run_until_complete
-        result_data = loop.run_until_complete(
-            _execute_pipeline_async(pipeline_id, document_id, execution_id)
+        exec_uuid = uuid.UUID(execution_id)
+        result_data = await _execute_pipeline_async(
+            pipeline_uuid or uuid.UUID(pipeline_id), uuid.UUID(document_id), exec_uuid
         )
         
         elapsed = time.time() - start_time
@@ -86,7 +148,8 @@ def execute_pipeline(pipeline_id: str, document_id: str, execution_id: str | Non
             "execution_id": execution_id,
             "elapsed_time": elapsed,
             "message": result_data.get("message", ""),
-            "results": result_data # Include the full results from the async function
+            # The full results are persisted on the execution record (PipelineExecution.results);
+            # they are not duplicated into the Celery result backend
         }
         
         if final_status == "error" and "error" not in final_result:
@@ -99,22 +162,19 @@ def execute_pipeline(pipeline_id: str, document_id: str, execution_id: str | Non
         elapsed = time.time() - start_time
         logger.error(f"FATAL Error in pipeline task {execution_id}: {str(e)}", exc_info=True)
         
-        # Attempt ASYNC fallback using the SAME loop
-        try:
-            async def fallback_update():
-                # Note: Re-getting context might be needed if main one failed badly
+        # Attempt fallback update with a fresh session (not possible if the ID itself was invalid)
+        if exec_uuid:
+            try:
                 async with get_async_session_context() as error_session:
                     logger.warning(f"Attempting asynchronous fallback to mark execution {execution_id} as FAILED.")
                     await _async_update_pipeline_execution_status(
                         error_session, 
-                        uuid.UUID(execution_id), 
+                        exec_uuid, 
                         "FAILED", 
                         error_message=f"Task failed unexpectedly: {str(e)}"
                     )
-            # Run fallback on the same loop
-            loop.run_until_complete(fallback_update())
-        except Exception as fallback_err:
-            logger.error(f"Failed ASYNCHRONOUS fallback status update for {execution_id}: {fallback_err}", exc_info=True)
+            except Exception as fallback_err:
+                logger.error(f"Failed ASYNCHRONOUS fallback status update for {execution_id}: {fallback_err}", exc_info=True)
              
         # Prepare error result for Celery
         return {
@@ -127,47 +187,54 @@ def execute_pipeline(pipeline_id: str, document_id: str, execution_id: str | Non
         }
 
 @celery_app.task(name="monitor_batch_process")
-def monitor_batch_process(batch_id, execution_ids):
+def monitor_batch_process(execution_results, batch_id):
     """
     Monitors the progress of a batch process of documents
     
+    Runs as the callback of the batch chord, which hands it the (small) status dicts returned by
+    the batch's tasks, so the execution IDs need not travel in its message.
+    
     Args:
+        execution_results (list): Results of the batch's tasks: a status dict per execute_pipeline
+            task, or a list of them per execute_pipeline_batch task
         batch_id (str): ID of the batch process
-        execution_ids (list): List of execution IDs to monitor
     
     Returns:
         dict: Status of the monitoring
     """
-    logger.info(f"Monitoring batch process {batch_id} with {len(execution_ids)} executions")
-    
-    # In a real implementation, we would check the status of each execution
-    # and update the status of the batch in the database
+    execution_results = [
+        result
+        for task_result in execution_results
+        for result in (task_result if isinstance(task_result, list) else [task_result])
+    ]
+    total_executions = len(execution_results)
+    completed = sum(
+        1 for result in execution_results
+        if isinstance(result, dict) and result.get("status") == "success"
+    )
+    logger.info(f"Batch process {batch_id} finished: {completed}/{total_executions} executions completed")
     
     return {
         "status": "success",
         "batch_id": batch_id,
-        "total_executions": len(execution_ids),
-        "completed": len(execution_ids),  # In a real implementation, we would count the completed ones
+        "total_executions": total_executions,
+        "completed": completed,
         "message": "Batch monitoring completed"
     }
 
-async def _execute_pipeline_async(pipeline_id: str, document_id: str, execution_id: str):
+async def _execute_pipeline_async(pipeline_id: uuid.UUID, document_id: uuid.UUID, execution_id: uuid.UUID):
     """
     Async core logic for pipeline execution. Uses shared session context.
     Handles intermediate status updates.
     
     Args:
-        pipeline_id (str): ID of the pipeline.
-        document_id (str): ID of the document.
-        execution_id (str): ID of the database execution record (UUID as string).
+        pipeline_id (UUID): ID of the pipeline.
+        document_id (UUID): ID of the document.
+        execution_id (UUID): ID of the database execution record.
         
     Returns:
         dict: Results of the pipeline execution, including status and any errors.
     """
-    exec_id_uuid = uuid.UUID(execution_id)
-    pipeline_id_uuid = uuid.UUID(pipeline_id)
-    document_id_uuid = uuid.UUID(document_id)
-    
     logger.info(f"[_execute_pipeline_async] Running for exec {execution_id}")
     
     # Default return values in case of early exit or unhandled error
@@ -178,17 +245,21 @@ async def _execute_pipeline_async(pipeline_id: str, document_id: str, execution_
         async with get_async_session_context() as session:
             logger.debug(f"[_execute_pipeline_async] Acquired session {id(session)} for exec {execution_id}")
             
-            # 1. Mark as RUNNING
-            await _async_update_pipeline_execution_status(session, exec_id_uuid, "RUNNING")
-
-            # 2. Load pipeline and document using the session
-            pipeline = await session.get(Pipeline, pipeline_id_uuid)
-            document = await session.get(Document, document_id_uuid)
+            # 1. Load pipeline and document in one query. The execution row itself is never
+            # loaded: its status is written with a single UPDATE at the end of the run. There is no
+            # separate RUNNING write, as the run is one transaction and nobody could see it.
+            loaded = (await session.execute(
+                select(Pipeline, Document).where(
+                    Pipeline.id == pipeline_id,
+                    Document.id == document_id,
+                )
+            )).first()
+            pipeline, document = loaded if loaded else (None, None)
                 
             if not pipeline or not document:
                 error_msg = f"Pipeline {pipeline_id} or document {document_id} not found"
                 logger.error(f"[_execute_pipeline_async] {error_msg} for exec {execution_id}")
-                await _async_update_pipeline_execution_status(session, exec_id_uuid, "FAILED", error_message=error_msg)
+                await _async_update_pipeline_execution_status(session, execution_id, "FAILED", error_message=error_msg)
                 # Return error context
                 final_result_context["error"] = error_msg
                 return final_result_context # Exit async function
@@ -197,7 +268,6 @@ async def _execute_pipeline_async(pipeline_id: str, document_id: str, execution_
             
             # 3. Get LLM Client (optional, based on pipeline steps)
             try:
-                 from core.dependencies import get_llm_client
                  llm_client = get_llm_client()
             except Exception as client_err:
                  logger.warning(f"Could not get LLM Client for pipeline execution {execution_id}: {client_err}. Some steps might fail.")
@@ -206,34 +276,46 @@ async def _execute_pipeline_async(pipeline_id: str, document_id: str, execution_
             # 4. Execute pipeline steps
             executor = PipelineExecutor(llm_client=llm_client)
             # Execute and get the results dictionary
-            results_context = await executor.execute(exec_id_uuid, pipeline, document) 
+            results_context = await executor.execute(execution_id, pipeline, document) 
 
             # 5. Update execution status based on results_context
             if results_context.get("status") == "error" or results_context.get("errors"):
                  error_message = "; ".join(results_context.get("errors", ["Unknown execution error"]))
                  logger.error(f"[_execute_pipeline_async] Pipeline execution {execution_id} completed with errors: {error_message}")
-                 await _async_update_pipeline_execution_status(session, exec_id_uuid, "FAILED", error_message=error_message, results=results_context)
+                 await _async_update_pipeline_execution_status(session, execution_id, "FAILED", error_message=error_message, results=results_context)
                  final_result_context = results_context # Pass back the context with errors
                  final_result_context["status"] = "error" # Ensure status is error
             else:
                 # Success case
                 logger.info(f"[_execute_pipeline_async] Pipeline execution {execution_id} completed successfully.")
                 
-                # 6. Save processing result record (optional, but good practice)
+                # Encode the results once: the same JSON is stored in the processing result and
+                # in the execution row
                 try:
-                    await create_processing_result(
-                        session,         # Pass session as first positional argument
-                        document_id=document.id, 
-                        pipeline_name=pipeline.name, 
-                        results=results_context # Pass results as 'results' keyword arg
-                    )
+                    results_json = encoded_json(results_context)
+                except TypeError as enc_err:
+                    logger.error(f"[_execute_pipeline_async] Failed to serialize results for exec {execution_id}: {enc_err}")
+                    results_json = encoded_json({"error": "Result serialization failed"})
+                
+                # 6. Save processing result record (optional, but good practice).
+                # It is committed in the same transaction as the COMPLETED status below; the savepoint
+                # keeps a failed insert from aborting that transaction.
+                try:
+                    async with session.begin_nested():
+                        await create_processing_result(
+                            session,         # Pass session as first positional argument
+                            document_id=document.id, 
+                            pipeline_name=pipeline.name, 
+                            results=results_context, # Pass results as 'results' keyword arg
+                            encoded_results=results_json
+                        )
                     logger.info(f"[_execute_pipeline_async] Processing results saved for doc {document.id} via pipeline {pipeline.id} (Exec ID: {execution_id})")
                 except Exception as pr_err:
                     logger.exception(f"[_execute_pipeline_async] Error saving processing results for exec {execution_id}: {str(pr_err)}")
                     # Log error but don't fail the task just for this
 
                 # 7. Mark execution as COMPLETED
-                await _async_update_pipeline_execution_status(session, exec_id_uuid, "COMPLETED", results=results_context)
+                await _async_update_pipeline_execution_status(session, execution_id, "COMPLETED", results=results_json)
                 final_result_context = results_context # Pass back success context
                 final_result_context["status"] = "success" # Ensure status is success
         
@@ -247,7 +329,7 @@ async def _execute_pipeline_async(pipeline_id: str, document_id: str, execution_
          try:
             async with get_async_session_context() as error_session:
                  logger.warning(f"[_execute_pipeline_async] Attempting final FAILED status update for {execution_id} in new session.")
-                 await _async_update_pipeline_execution_status(error_session, exec_id_uuid, "FAILED", error_message=final_result_context["error"])
+                 await _async_update_pipeline_execution_status(error_session, execution_id, "FAILED", error_message=final_result_context["error"])
          except Exception as final_update_err:
             logger.error(f"[_execute_pipeline_async] Failed to update status to FAILED after unhandled exception for {execution_id}: {final_update_err}", exc_info=True)
             
@@ -259,41 +341,59 @@ async def _async_update_pipeline_execution_status(
     session: AsyncSession, 
     execution_id: uuid.UUID, 
     status: str, 
-    results: dict | None = None, 
+    results=None, 
     error_message: str | None = None
 ):
-    """Asynchronously update pipeline execution status using the provided session."""
+    """
+    Asynchronously update pipeline execution status using the provided session.
+    Issues one UPDATE by primary key; the execution row is not loaded into the session.
+    `results` is a dict or a value already encoded with encoded_json.
+    """
     if not execution_id:
         logger.error("Cannot update status: Execution ID is missing.")
         return False
         
     try:
-        execution = await session.get(PipelineExecution, execution_id)
-        if not execution:
-            logger.error(f"Cannot update status: Execution {execution_id} not found.")
-            return False
-
+        # Naive UTC, like the other timestamps of the row (started_at defaults to utcnow, created_at
+        # is the server's now()); datetime.now() wrote local time into completed_at/updated_at
+        now = datetime.utcnow()
         # Update common fields
-        execution.status = status
-        execution.updated_at = datetime.now()
+        values = {"status": status, "updated_at": now}
 
         # Update status-specific fields
-        if status == "RUNNING" and not execution.started_at:
-            execution.started_at = datetime.now()
+        if status == "RUNNING":
+            values["started_at"] = func.coalesce(PipelineExecution.started_at, now)
         elif status == "COMPLETED":
-            execution.completed_at = datetime.now()
-            execution.error_message = None # Clear error on completion
-            if results:
-                # Ensure results are JSON serializable - PipelineExecutor results should be
-                try:
-                    execution.results = json.dumps(results)
-                except TypeError as json_err:
-                    logger.error(f"Failed to serialize results for execution {execution_id}: {json_err}")
-                    execution.results = json.dumps({"error": "Result serialization failed"})
+            values["completed_at"] = now
+            values["error_message"] = None # Clear error on completion
+            if results is not None:
+                # Stored as the dict itself: the JSON column serializes it once when binding
+                # (a json.dumps here stored a JSON string inside the JSON column, encoding it twice)
+                values["results"] = results
         elif status == "FAILED":
-            execution.error_message = error_message[:1024] if error_message else "Unknown error" # Truncate error
+            values["error_message"] = error_message[:1024] if error_message else "Unknown error" # Truncate error
+
+        def build_update():
+            return (
+                update(PipelineExecution)
+                .where(PipelineExecution.id == execution_id)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
 
-        await session.flush() # Make changes visible within the transaction
+        try:
+            result = await session.execute(build_update())
+        except StatementError as bind_err:
+            # Unserializable results fail while binding, before the statement reaches the DB,
+            # so the transaction is still usable
+            if not isinstance(bind_err.orig, TypeError) or "results" not in values:
+                raise
+            logger.error(f"Failed to serialize results for execution {execution_id}: {bind_err.orig}")
+            values["results"] = {"error": "Result serialization failed"}
+            result = await session.execute(build_update())
+        if not result.rowcount:
+            logger.error(f"Cannot update status: Execution {execution_id} not found.")
+            return False
         logger.info(f"Updated execution {execution_id} status to {status} in session {id(session)}")
         return True
     except Exception as e:
@@ -304,8 +404,52 @@ async def _async_update_pipeline_execution_status(
 
 # --- NEW Embedding Processing Task ---
 
-@celery_app.task(name="process_document_embeddings")
+@lru_cache(maxsize=None)
+def _get_text_extraction_processor():
+    """TextExtractionProcessor shared by every task of this worker process (it is stateless)."""
+    return TextExtractionProcessor()
+
+@lru_cache(maxsize=32)
+def _get_embedding_processor(model: str, chunk_size: int, chunk_overlap: int):
+    """
+    EmbeddingProcessor per configuration, built once per worker process around the process-wide
+    LLM client and reused by later tasks with the same settings.
+    """
+    return get_processor(
+        "embedding",
+        config={
+            "model": model,
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap
+        },
+        llm_client=get_llm_client()
+    )
+
+# How long a delivery of an embedding task is remembered (see _is_redelivery); far longer than
+# task_time_limit, so every redelivery of a message is still recognised
+EMBEDDING_DELIVERY_TTL_SECONDS = 24 * 60 * 60
+
+async def _is_redelivery(task_id: str | None) -> bool:
+    """
+    Whether this Celery message has been started before. With task_acks_late and
+    task_reject_on_worker_lost, a message whose worker process died (e.g. killed for memory on a
+    huge PDF) is delivered again. Redis unavailable or no task id counts as a first delivery.
+    """
+    if not task_id:
+        return False
+    try:
+        replies = await redis_cache_pipeline([
+            ("incr", (f"celery:deliveries:{task_id}",)),
+            ("expire", (f"celery:deliveries:{task_id}", EMBEDDING_DELIVERY_TTL_SECONDS)),
+        ])
+    except Exception as e:
+        embedding_logger.warning(f"Could not record delivery of task {task_id}: {e}")
+        return False
+    return bool(replies) and replies[0] > 1
+
+@celery_app.task(name="process_document_embeddings", bind=True)
 def process_document_embeddings_task(
+    self,
     document_id_str: str,
     user_id_str: str, # Pass user_id for logging/context
     model: str,
@@ -326,7 +470,8 @@ def process_document_embeddings_task(
             user_id_str,
             model,
             chunk_size,
-            chunk_overlap
+            chunk_overlap,
+            task_id=self.request.id
         ))
         elapsed = time.time() - start_time
         embedding_logger.info(f"Embedding processing task for doc {document_id_str} completed successfully in {elapsed:.2f}s")
@@ -342,25 +487,57 @@ async def _process_document_embeddings_async(
     user_id_str: str, 
     model: str,
     chunk_size: int,
-    chunk_overlap: int
+    chunk_overlap: int,
+    task_id: str | None = None
 ):
     """
     Asynchronous helper function containing the core logic for embedding processing.
     Uses the shared async session context manager.
     Now allows reprocessing for COMPLETED/FAILED documents.
+    A redelivered task (its worker process died mid-run) marks the document FAILED instead of
+    running again, so one document that kills workers cannot loop through the queue.
     """
     document_id = uuid.UUID(document_id_str)
     user_id = uuid.UUID(user_id_str)
 
     embedding_logger.info(f"[Async Helper] Starting embedding processing/reprocessing for doc {document_id} with model '{model}'")
-    
-    # Import necessary components here to avoid circular dependencies at module level
-    from database.session import get_async_session_context
-    from modules.document.service import DocumentService # Keep for save_embeddings
-    from database.models.document import Document, ProcessingStatus # Import Enum and Document Model
-    from core.dependencies import get_llm_client
-    # Import processors directly or via get_processor
-    from modules.pipeline.processors import TextExtractionProcessor, EmbeddingProcessor, get_processor
+
+
+    if await _is_redelivery(task_id):
+        embedding_logger.error(f"[Async Helper] Task {task_id} for doc {document_id} was redelivered after its worker was lost. Marking FAILED.")
+        async with get_async_session_context() as session:
+            await session.execute(
+                update(Document)
+                .where(Document.id == document_id, Document.processing_status != ProcessingStatus.COMPLETED)
+                .values(
+                    processing_status=ProcessingStatus.FAILED,
+                    error_message="Processing was interrupted: the worker stopped (e.g. out of memory) while processing this document."
+                )
+                .execution_options(synchronize_session=False)
+            )
+        return
+
+    # 1. Claim the document: a short UPDATE, committed on its own, flips it to PROCESSING unless
+    # another task already did, so a repeated request does not regenerate the same embeddings
+    # concurrently. No lock is held while the (slow) extraction and embedding calls run.
+    async with get_async_session_context() as claim_session:
+        claimed = await claim_session.scalar(
+            update(Document)
+            .where(Document.id == document_id, Document.processing_status != ProcessingStatus.PROCESSING)
+            .values(processing_status=ProcessingStatus.PROCESSING)
+            .returning(Document.id)
+            .execution_options(synchronize_session=False)
+        )
+        found = claimed is not None or await claim_session.scalar(
+            select(Document.id).where(Document.id == document_id)
+        ) is not None
+    if claimed is None:
+        if found:
+            embedding_logger.warning(f"[Async Helper] Document {document_id} is already being processed by another task. Skipping.")
+        else:
+            embedding_logger.warning(f"[Async Helper] Document {document_id} not found. Skipping.")
+        return # Exit task gracefully
+    embedding_logger.info(f"[Async Helper] Claimed document {document_id} (status PROCESSING).")
 
     final_status = ProcessingStatus.FAILED # Default to failed
     error_message_final = "Unknown processing error"
@@ -369,37 +546,17 @@ async def _process_document_embeddings_async(
         async with get_async_session_context() as session:
             embedding_logger.debug(f"[Async Helper] Acquired DB session {id(session)} for doc {document_id}")
             
-            # 1. Get document and set status to PROCESSING
+            # 2. Load the document (no lock: the claim above keeps other tasks away)
             document = await session.get(Document, document_id)
             if not document:
-                embedding_logger.error(f"[Async Helper] Document {document_id} not found.")
+                embedding_logger.warning(f"[Async Helper] Document {document_id} was deleted after it was claimed. Skipping.")
                 return # Exit task gracefully
-            
-            # Check if already processing to avoid redundant work
-            # Allow reprocessing for COMPLETED or FAILED states
-            if document.processing_status == ProcessingStatus.PROCESSING:
-                 embedding_logger.warning(f"[Async Helper] Document {document_id} is already {document.processing_status.value}. Skipping task.")
-                 return
-            elif document.processing_status == ProcessingStatus.PENDING:
-                 embedding_logger.info(f"[Async Helper] Document {document_id} is PENDING. Proceeding to PROCESSING.")
-            elif document.processing_status in [ProcessingStatus.COMPLETED, ProcessingStatus.FAILED]:
-                embedding_logger.info(f"[Async Helper] Document {document_id} status is {document.processing_status.value}. Reprocessing allowed.")
-            # Add other states if needed, e.g. NOT_PROCESSED
-            elif document.processing_status == ProcessingStatus.NOT_PROCESSED:
-                embedding_logger.info(f"[Async Helper] Document {document_id} is NOT_PROCESSED. Starting initial processing.")
-            else:
-                # Should not happen with current enum, but good practice
-                embedding_logger.warning(f"[Async Helper] Document {document_id} has unexpected status {document.processing_status.value}. Attempting to process anyway.")
-
-            # Set status to PROCESSING and clear any previous error message
-            document.processing_status = ProcessingStatus.PROCESSING
-            document.error_message = None # Clear previous errors on new attempt
-            await session.flush() # Flush to make status update visible
-            embedding_logger.info(f"[Async Helper] Set doc {document_id} status to PROCESSING and cleared error message.")
-            
+
+            started_at = time.perf_counter()
+
             # --- START TEXT EXTRACTION ---
             context = {} # Initialize context
-            text_processor = TextExtractionProcessor() # Instantiate text processor
+            text_processor = _get_text_extraction_processor()
             embedding_logger.info(f"[Async Helper] Running TextExtractionProcessor for doc {document_id}")
             context = await text_processor.process(document, context) # Run text extraction
             document_content = context.get("document_content")
@@ -416,21 +573,13 @@ async def _process_document_embeddings_async(
                 
                 # --- START EMBEDDING PROCESSING (only if text extraction succeeded) ---
                 try:
-                    llm_client = get_llm_client()
-                    embedding_processor = get_processor(
-                        "embedding", 
-                        config={
-                            "model": model,
-                            "chunk_size": chunk_size,
-                            "chunk_overlap": chunk_overlap
-                        },
-                        llm_client=llm_client
-                    )
+                    embedding_processor = _get_embedding_processor(model, chunk_size, chunk_overlap)
                     embedding_logger.debug(f"[Async Helper] Embedding processor obtained for doc {document_id}")
 
                     embedding_logger.info(f"[Async Helper] Calling embedding_processor.process() for doc {document_id}...")
                     
-                    # Pass the context containing the extracted text
+                    # Pass the context containing the extracted text, plus the session for the embedding cache
+                    context["db_session"] = session
                     result = await embedding_processor.process(document, context) 
                     embedding_logger.debug(f"[Async Helper] Processor result for doc {document_id}: {result}")
                     
@@ -446,8 +595,8 @@ async def _process_document_embeddings_async(
                         if embeddings_data and chunks_text_data:
                             saved_model = result.get("model", model)
                             try:
-                                # Need DocumentService to save embeddings
-                                doc_service = DocumentService(llm_client=llm_client) # Instantiate service
+                                # Need DocumentService to save embeddings (process-wide singleton)
+                                doc_service = get_document_service()
                                 # Call updated save_embeddings with necessary args
                                 saved_list = await doc_service.save_embeddings(
                                     db=session,
@@ -481,26 +630,142 @@ async def _process_document_embeddings_async(
             # ensuring it reflects extraction or embedding failure
             document.processing_status = final_status
             document.error_message = error_message_final
-            embedding_logger.info(f"[Async Helper] Setting final status for doc {document_id} to {final_status.value} with error: {error_message_final}")
+            duration_ms = (time.perf_counter() - started_at) * 1000
+            embedding_logger.info(f"[Async Helper] Setting final status for doc {document_id} to {final_status.value} after {duration_ms:.0f}ms with error: {error_message_final}")
+            owner_id = document.user_id
             # Commit happens automatically via context manager 'async with' on successful exit
 
+        if final_status == ProcessingStatus.COMPLETED:
+            # Cached RAG retrievals and answers of the owner predate the new chunks (committed above)
+            await bump_documents_version(owner_id)
+
     except Exception as task_exc:
         embedding_logger.error(f"[Async Helper] Unhandled exception in embedding task for doc {document_id}: {task_exc}", exc_info=True)
         # Attempt to update status to FAILED in a new session if the main one failed
         try:
             async with get_async_session_context() as error_session:
-                doc_to_fail = await error_session.get(Document, document_id)
-                if doc_to_fail and doc_to_fail.processing_status != ProcessingStatus.COMPLETED: # Avoid overwriting completed status
-                    doc_to_fail.processing_status = ProcessingStatus.FAILED
-                    doc_to_fail.error_message = f"Task failed: {task_exc}"[:1024]
-                    await error_session.flush() # Commit happens on context exit
+                # One UPDATE instead of loading the whole document (content included) to flip a status
+                result = await error_session.execute(
+                    update(Document)
+                    .where(Document.id == document_id, Document.processing_status != ProcessingStatus.COMPLETED) # Avoid overwriting completed status
+                    .values(processing_status=ProcessingStatus.FAILED, error_message=f"Task failed: {task_exc}"[:1024])
+                    .execution_options(synchronize_session=False)
+                ) # Commit happens on context exit
+                if result.rowcount:
                     embedding_logger.info(f"[Async Helper] Updated doc {document_id} status to FAILED due to task exception.")
         except Exception as update_err:
             embedding_logger.error(f"[Async Helper] Failed to update document status to FAILED after task exception for doc {document_id}: {update_err}", exc_info=True)
         # No need to re-raise here, Celery will mark failed based on return/exception
 
+@celery_app.task(name="prune_embedding_cache")
+def prune_embedding_cache_task():
+    """
+    Celery task deleting persistent chunk embeddings older than CHUNK_EMBEDDING_CACHE_MAX_AGE_DAYS
+    (scheduled daily by celery beat).
+    """
+    loop = asyncio.get_event_loop() # Get the current event loop
+    try:
+        deleted = loop.run_until_complete(_prune_embedding_cache_async())
+        return {"status": "success", "deleted": deleted}
+    except Exception as e:
+        embedding_logger.error(f"Embedding cache prune failed: {e}", exc_info=True)
+        return {"status": "error", "error": str(e)}
+
+async def _prune_embedding_cache_async() -> int:
+    async with get_async_session_context() as session:
+        deleted = await prune_embeddings(session, settings.CHUNK_EMBEDDING_CACHE_MAX_AGE_DAYS)
+    embedding_logger.info(f"Pruned {deleted} embedding cache entries older than {settings.CHUNK_EMBEDDING_CACHE_MAX_AGE_DAYS} days")
+    return deleted
+
 # --- End NEW Embedding Processing Task ---
 
+# --- Conversation Summary Task ---
+
+@celery_app.task(name="summarize_conversation")
+def summarize_conversation_task(conversation_id_str: str):
+    """
+    Celery task to refresh the running summary of the messages that fell out of the chat
+    history window (see ChatService / CHAT_WINDOW_MESSAGES).
+    """
+    loop = asyncio.get_event_loop() # Get the current event loop
+    try:
+        summarized = loop.run_until_complete(_summarize_conversation_async(uuid.UUID(conversation_id_str)))
+        return {"status": "success", "conversation_id": conversation_id_str, "summarized": summarized}
+    except Exception as e:
+        logger.error(f"Summary task for conversation {conversation_id_str} failed: {e}", exc_info=True)
+        return {"status": "error", "conversation_id": conversation_id_str, "error": str(e)}
+
+async def _summarize_conversation_async(conversation_id: uuid.UUID) -> bool:
+    """
+    Fold the messages between the previous summary and the history window into the summary.
+    Returns False if the summary was still fresh enough.
+    """
+    async with get_async_session_context() as session:
+        # Current summary state and message count in one round trip
+        message_count = (
+            select(func.count())
+            .select_from(Message)
+            .where(Message.conversation_id == conversation_id)
+            .scalar_subquery()
+        )
+        row = (await session.execute(
+            select(Conversation.summary, Conversation.summary_message_count, message_count)
+            .where(Conversation.id == conversation_id)
+        )).first()
+        if not row:
+            logger.warning(f"Summary requested for missing conversation {conversation_id}")
+            return False
+
+        previous_summary, already_covered, total = row
+        covered = max(total - settings.CHAT_WINDOW_MESSAGES, 0)
+        already_covered = already_covered or 0
+        # Same threshold ChatService schedules on; a duplicate request finds the summary fresh
+        if covered - already_covered < settings.CHAT_SUMMARY_MIN_NEW_MESSAGES:
+            return False
+
+        # The transcript is concatenated by Postgres (string_agg), so one text value comes back
+        # instead of a row per message
+        new_messages = (
+            select(Message.role, Message.content, Message.timestamp)
+            .where(Message.conversation_id == conversation_id)
+            .order_by(Message.timestamp)
+            .offset(already_covered)
+            .limit(covered - already_covered)
+            .subquery()
+        )
+        transcript = await session.scalar(
+            select(func.string_agg(
+                new_messages.c.role + literal(": ") + new_messages.c.content,
+                aggregate_order_by(literal("\n"), new_messages.c.timestamp)
+            ))
+        ) or ""
+
+        llm_client = get_llm_client()
+        if not llm_client:
+            raise RuntimeError("LLM client is not available for conversation summaries.")
+        previous = previous_summary or "(none)"
+        summary = await llm_client.generate_chat_completion(
+            messages=[
+                {"role": "system", "content": "Update the summary of a conversation between a user and an assistant. "
+                                              "Keep facts, decisions and open questions; be concise."},
+                {"role": "user", "content": f"Current summary:\n{previous}\n\nNew messages:\n{transcript}"}
+            ],
+            model=settings.DEFAULT_CHAT_MODEL,
+            temperature=0.2,
+            stream=False
+        )
+
+        await session.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .values(summary=summary, summary_message_count=covered)
+        )
+        logger.info(f"Updated summary of conversation {conversation_id} (covers {covered} messages)")
+        # Commit happens automatically via context manager 'async with' on successful exit
+        return True
+
+# --- End Conversation Summary Task ---
+
 logger.info("Celery tasks module adapted to use get_event_loop().run_until_complete().")
 
   
@@ -4,6 +4,7 @@ Configuración del worker de Celery para procesamiento asíncrono
 import os
 import logging
 from celery import Celery
+from celery.signals import worker_process_init
 from core.config import settings
 
 # Configurar logging
@@ -24,11 +25,49 @@ celery_app.conf.result_backend = settings.REDIS_URL
 celery_app.conf.update(
     task_track_started=True,
     task_time_limit=30 * 60,  # 30 minutos
-    accept_content=["json", "pickle"],
+    accept_content=["json", "pickle", "msgpack"],
     task_serializer="json",
-    result_serializer="json",
+    # Los resultados son diccionarios pequeños de estado (los resultados completos se guardan en la
+    # base de datos); msgpack los codifica más rápido y más compactos que JSON
+    result_serializer="msgpack",
+    # Las tareas pasan la mayor parte del tiempo esperando a la API de embeddings/LLM, así que
+    # conviene más procesos que núcleos para aprovechar el fan-out en paralelo de los lotes
+    worker_concurrency=settings.CELERY_WORKER_CONCURRENCY,
+    # Estrategia "fair": cada proceso reserva una sola tarea a la vez y la confirma al terminarla,
+    # así las tareas largas (lotes, embeddings) no esperan en la cola de un proceso ocupado
+    # mientras otros están libres. El visibility timeout de Redis (1 h por defecto) supera el
+    # task_time_limit, por lo que una tarea en curso no se vuelve a entregar.
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+    # Si el proceso muere a mitad de una tarea (OOM, kill), la tarea vuelve a la cola. La tarea de
+    # embeddings solo se ejecuta una vez por mensaje: una reentrega marca el documento FAILED (ver
+    # _is_redelivery en tasks.py), para que un PDF que tumba al worker no se reintente sin fin
+    task_reject_on_worker_lost=True,
+    # Los embeddings (extracción + llamadas a la API) van a su propia cola para poder dedicarles
+    # workers sin que retrasen las ejecuciones de pipelines
+    task_routes={
+        "process_document_embeddings": {"queue": "embeddings"},
+    },
+    # Limpieza diaria de la caché persistente de embeddings (requiere un proceso `celery beat`)
+    beat_schedule={
+        "prune-embedding-cache": {"task": "prune_embedding_cache", "schedule": 24 * 60 * 60},
+    },
 )
 
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """
+    Crea los singletons del cliente LLM y de DocumentService una vez por proceso hijo (después
+    del fork), para que la primera tarea no pague su inicialización y todas reutilicen el mismo
+    pool de conexiones HTTP.
+    """
+    from core.dependencies import get_llm_client_instance, get_document_service_instance
+    try:
+        get_llm_client_instance()
+        get_document_service_instance()
+    except Exception as e:
+        logger.warning(f"No se pudieron inicializar los servicios del worker: {e}")
+
 # Configurar importación automática de tareas
 celery_app.autodiscover_tasks(['tasks'])
 
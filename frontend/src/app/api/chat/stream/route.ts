@@ -41,6 +41,12 @@ export async function POST(request: Request) {
       console.log("[API Stream] Connecting to backend");
     }
     
+    // Aborting the upstream request closes the backend connection, which is how the backend
+    // notices that nobody is reading anymore; abort it as soon as the browser goes away
+    const upstream = new AbortController();
+    const abortUpstream = () => upstream.abort();
+    request.signal.addEventListener('abort', abortUpstream);
+
     // Call the backend
     const response = await fetch(url, {
       method: 'POST',
@@ -49,6 +55,7 @@ export async function POST(request: Request) {
         'Authorization': `Bearer ${accessToken}`
       },
       body: JSON.stringify(requestBody),
+      signal: upstream.signal,
     });
     
     if (!response.ok) {
@@ -88,25 +95,30 @@ export async function POST(request: Request) {
       throw new Error('Could not get backend stream');
     }
     
-    // Create a stream transformer to pass through the data
+    // Pass the data through, reading from the backend only as fast as the browser consumes it
+    const reader = readable.getReader();
     const stream = new ReadableStream({
-      async start(controller) {
-        const reader = readable.getReader();
-        
+      async pull(controller) {
         try {
-          while (true) {
-            const { done, value } = await reader.read();
-            if (done) {
-              controller.close();
-              break;
-            }
-            
-            controller.enqueue(value);
+          const { done, value } = await reader.read();
+          if (done) {
+            request.signal.removeEventListener('abort', abortUpstream);
+            controller.close();
+            return;
           }
+          controller.enqueue(value);
         } catch (error) {
-          console.error("Stream processing error");
+          if (!upstream.signal.aborted) {
+            console.error("Stream processing error");
+          }
           controller.error(error);
         }
+      },
+      async cancel(reason) {
+        // The browser disconnected: stop reading and close the backend connection
+        request.signal.removeEventListener('abort', abortUpstream);
+        await reader.cancel(reason).catch(() => {});
+        upstream.abort();
       }
     });
 
@@ -115,7 +127,8 @@ export async function POST(request: Request) {
       headers: {
         'Content-Type': 'text/event-stream',
         'Cache-Control': 'no-cache, no-transform',
-        'Connection': 'keep-alive'
+        'Connection': 'keep-alive',
+        'X-Accel-Buffering': 'no'
       }
     });
     
@@ -523,7 +523,7 @@ export default function ChatPage() {
         
         const reader = response.body.getReader();
         const decoder = new TextDecoder();
-        let buffer = ""; // Buffer for incomplete lines/JSON
+        let buffer = ""; // Buffer for incomplete SSE lines
         // Explicitly type receivedConversationId
         let receivedConversationId: string | null = null;
         const startTime = Date.now();
@@ -541,12 +541,17 @@ export default function ChatPage() {
                 // Decode and add to buffer
                 buffer += decoder.decode(value, { stream: true });
 
-                // Process complete lines (JSON objects) in the buffer
+                // Process complete lines in the buffer. Only SSE "data:" lines carry a JSON payload;
+                // blank event separators and ": keepalive" comments are skipped
                 let newlineIndex;
                 while ((newlineIndex = buffer.indexOf('\n')) >= 0) {
-                    const line = buffer.substring(0, newlineIndex).trim();
+                    const rawLine = buffer.substring(0, newlineIndex).trim();
                     buffer = buffer.substring(newlineIndex + 1);
 
+                    if (!rawLine.startsWith('data:')) continue;
+                    const line = rawLine.slice(5).trim();
+                    if (line === '[DONE]') continue;
+
                     if (line) {
                         try {
                             const chunkData = JSON.parse(line);
@@ -592,10 +597,11 @@ export default function ChatPage() {
             }
 
              // Process any remaining buffer content (optional, but good practice)
-            if (buffer.trim()) {
+            const remaining = buffer.trim().replace(/^data:/, '').trim();
+            if (remaining && remaining !== '[DONE]') {
                  console.warn("Stream ended with partial data in buffer:", buffer);
                  try {
-                    const chunkData = JSON.parse(buffer.trim());
+                    const chunkData = JSON.parse(remaining);
                     // Update last message content IN PLACE
                     if (chunkData.content) {
                          setCurrentConversation(prev => {
@@ -51,8 +51,8 @@ export function DocumentEmbeddingTab({ document }: DocumentEmbeddingTabProps) {
   const [processingError, setProcessingError] = useState<string | null>(null);
   const [processingSuccess, setProcessingSuccess] = useState<string | null>(null);
   const [embeddingModel, setEmbeddingModel] = useState<string>('text-embedding-3-small');
-  const [chunkSize, setChunkSize] = useState<number>(1000);
-  const [chunkOverlap, setChunkOverlap] = useState<number>(200);
+  const [chunkSize, setChunkSize] = useState<number>(512);
+  const [chunkOverlap, setChunkOverlap] = useState<number>(128);
 
   // States for the RAG search
   const [searchQuery, setSearchQuery] = useState<string>('');
@@ -213,13 +213,13 @@ export function DocumentEmbeddingTab({ document }: DocumentEmbeddingTabProps) {
             <div className="space-y-2">
               <div className="flex justify-between">
                 <Label>Chunk Size</Label>
-                <span className="text-sm">{chunkSize} characters</span>
+                <span className="text-sm">{chunkSize} tokens</span>
               </div>
               <Slider
                 value={[chunkSize]}
-                min={100}
-                max={5000}
-                step={100}
+                min={128}
+                max={2048}
+                step={64}
                 onValueChange={(value) => setChunkSize(value[0])}
               />
             </div>
@@ -227,13 +227,13 @@ export function DocumentEmbeddingTab({ document }: DocumentEmbeddingTabProps) {
             <div className="space-y-2">
               <div className="flex justify-between">
                 <Label>Chunk Overlap</Label>
-                <span className="text-sm">{chunkOverlap} characters</span>
+                <span className="text-sm">{chunkOverlap} tokens</span>
               </div>
               <Slider
                 value={[chunkOverlap]}
                 min={0}
-                max={1000}
-                step={50}
+                max={512}
+                step={32}
                 onValueChange={(value) => setChunkOverlap(value[0])}
               />
             </div>